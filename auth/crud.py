@@ -1,6 +1,6 @@
 # auth/crud.py
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import insert
 from . import models, schemas, utils
 import uuid
 
@@ -10,19 +10,19 @@ def get_user_by_email(db: Session, email: str):
 def get_user_by_id(db: Session, user_id: uuid.UUID):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = utils.get_password_hash(user.password)
-    db_user = models.User(
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str | None = None):
+    # Async callers hash in a worker thread and pass the result in
+    hashed_password = hashed_password or utils.get_password_hash(user.password)
+    stmt = insert(models.User.__table__).values(
         email=user.email,
         full_name=user.full_name,
         hashed_password=hashed_password,
         role=user.role,
         is_active=True,  # Explicitly set user as active
         is_verified=False  # Explicitly set user as not verified
-    )
-    db.add(db_user)
+    ).returning(*models.User.__table__.c)
+    db_user = db.execute(stmt).one()
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 def authenticate_user(db: Session, email: str, password: str):
@@ -34,14 +34,13 @@ def authenticate_user(db: Session, email: str, password: str):
     return user
 
 def create_user_session(db: Session, user_id: uuid.UUID, token: str, expires_at):
-    session = models.UserSession(
+    stmt = insert(models.UserSession.__table__).values(
         user_id=user_id,
         token=token,
         expires_at=expires_at
-    )
-    db.add(session)
+    ).returning(*models.UserSession.__table__.c)
+    session = db.execute(stmt).one()
     db.commit()
-    db.refresh(session)
     return session
 
 def get_user_session(db: Session, token: str):
@@ -1,12 +1,13 @@
 # auth/routes.py
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import List
 import uuid
 
-from database import get_db
+from database import get_async_db, get_read_db
 from . import schemas, crud, utils
 from .utils import create_access_token, decode_access_token
 
@@ -16,7 +17,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,7 +33,7 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
     
-    user = crud.get_user_by_id(db, uuid.UUID(user_id))
+    user = await db.run_sync(crud.get_user_by_id, uuid.UUID(user_id))
     if user is None:
         raise credentials_exception
     
@@ -44,18 +45,22 @@ async def get_current_active_user(current_user: schemas.UserResponse = Depends(g
     return current_user
 
 @router.post("/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.run_sync(crud.get_user_by_email, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    # bcrypt is deliberately slow; keep it off the event loop
+    hashed_password = await run_in_threadpool(utils.get_password_hash, user.password)
+    return await db.run_sync(crud.create_user, user, hashed_password)
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    user = await db.run_sync(crud.get_user_by_email, form_data.username)
+    if user and not await run_in_threadpool(utils.verify_password, form_data.password, user.hashed_password):
+        user = None
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,16 +76,16 @@ def login_for_access_token(
     
     # Store session in database
     expires_at = datetime.utcnow() + access_token_expires
-    crud.create_user_session(db, user.id, access_token, expires_at)
+    await db.run_sync(crud.create_user_session, user.id, access_token, expires_at)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-def logout_user(
+async def logout_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    crud.delete_user_session(db, token)
+    await db.run_sync(crud.delete_user_session, token)
     return {"message": "Successfully logged out"}
 
 @router.get("/me", response_model=schemas.UserResponse)
@@ -88,28 +93,28 @@ def read_users_me(current_user: schemas.UserResponse = Depends(get_current_activ
     return current_user
 
 @router.get("/users", response_model=List[schemas.UserResponse])
-def read_all_users(
+async def read_all_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.UserResponse = Depends(get_current_active_user)
 ):
     if current_user.role not in ["official", "analyst"]:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    users = crud.get_all_users(db, skip=skip, limit=limit)
+    users = await db.run_sync(crud.get_all_users, skip=skip, limit=limit)
     return users
 
 @router.put("/users/{user_id}/role", response_model=schemas.UserResponse)
-def update_user_role(
+async def update_user_role(
     user_id: str,
     role: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.UserResponse = Depends(get_current_active_user)
 ):
     if current_user.role != "analyst":
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    user = crud.update_user_role(db, uuid.UUID(user_id), role)
+    user = await db.run_sync(crud.update_user_role, uuid.UUID(user_id), role)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -0,0 +1,59 @@
+# bench_async_engine.py
+"""
+Requests/second of the hazard GeoJSON read at increasing concurrency, run the
+way the API used to (sync Session on a 40-thread pool, FastAPI's default
+limit) and the way it does now (AsyncSession on the event loop). Needs
+DATABASE_URL pointing at a migrated database with some reports in it.
+
+    python bench_async_engine.py [requests] [concurrency ...]
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import crud
+from database import AsyncSessionLocal, SessionLocal, async_engine
+
+THREADPOOL_SIZE = 40
+
+def sync_read():
+    db = SessionLocal()
+    try:
+        crud.get_hazard_change_seq(db)
+        return crud.get_hazard_geojson(db, limit=100)
+    finally:
+        db.close()
+
+def bench_sync(requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(concurrency, THREADPOOL_SIZE)) as pool:
+        list(pool.map(lambda _: sync_read(), range(requests)))
+    return requests / (time.perf_counter() - start)
+
+async def async_read(gate):
+    async with gate, AsyncSessionLocal() as db:
+        await db.run_sync(crud.get_hazard_change_seq)
+        return await db.run_sync(crud.get_hazard_geojson, limit=100)
+
+async def bench_async(requests, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(async_read(gate) for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+async def main(requests, levels):
+    # Warm both pools so connection setup is not measured
+    bench_sync(20, 10)
+    await bench_async(20, 10)
+    print(f"{'concurrency':>11} {'sync req/s':>12} {'async req/s':>12}")
+    for concurrency in levels:
+        sync_rate = bench_sync(requests, concurrency)
+        async_rate = await bench_async(requests, concurrency)
+        print(f"{concurrency:>11} {sync_rate:>12.1f} {async_rate:>12.1f}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    levels = [int(c) for c in sys.argv[2:]] or [1, 10, 50, 200]
+    asyncio.run(main(requests, levels))
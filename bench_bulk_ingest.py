@@ -0,0 +1,67 @@
+# bench_bulk_ingest.py
+"""
+Compare reports/second of one-by-one POST /hazards/ against POST /hazards/bulk
+on a running API.
+
+    python bench_bulk_ingest.py [rows]
+"""
+import json
+import random
+import sys
+import time
+
+import requests
+
+BASE_URL = 'http://127.0.0.1:8001'
+BENCH_USER = {"email": "bench@example.com", "full_name": "Bench User", "password": "benchpassword123"}
+
+def auth_headers():
+    # Registering twice just fails; the login works either way
+    requests.post(f'{BASE_URL}/auth/register', json=BENCH_USER)
+    response = requests.post(f'{BASE_URL}/auth/token', data={"username": BENCH_USER["email"], "password": BENCH_USER["password"]})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def make_reports(n):
+    return [
+        {
+            "hazard_type": random.choice(["Flooding", "High Tide", "Erosion", "Storm Surge"]),
+            "latitude": random.uniform(8.0, 22.0),
+            "longitude": random.uniform(68.0, 88.0),
+            "severity": random.randint(1, 5),
+            "description": "bulk ingest benchmark",
+        }
+        for _ in range(n)
+    ]
+
+def bench_single(reports):
+    session = requests.Session()
+    start = time.perf_counter()
+    for report in reports:
+        session.post(f'{BASE_URL}/hazards/', json=report).raise_for_status()
+    return time.perf_counter() - start
+
+def bench_bulk(reports, headers, ndjson=False):
+    start = time.perf_counter()
+    if ndjson:
+        body = "\n".join(json.dumps(r) for r in reports)
+        response = requests.post(f'{BASE_URL}/hazards/bulk', data=body, headers={**headers, "Content-Type": "application/x-ndjson"})
+    else:
+        response = requests.post(f'{BASE_URL}/hazards/bulk', json=reports, headers=headers)
+    response.raise_for_status()
+    result = response.json()
+    assert result["created"] + result["merged"] == len(reports)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # One-by-one is slow; a smaller sample is enough for its rate
+    single_rows = min(rows, 500)
+    single = bench_single(make_reports(single_rows))
+    headers = auth_headers()
+    bulk = bench_bulk(make_reports(rows), headers)
+    bulk_ndjson = bench_bulk(make_reports(rows), headers, ndjson=True)
+    print(f"POST /hazards/ x{single_rows}: {single_rows / single:10.0f} reports/s")
+    print(f"POST /hazards/bulk (JSON) x{rows}: {rows / bulk:10.0f} reports/s")
+    print(f"POST /hazards/bulk (NDJSON) x{rows}: {rows / bulk_ndjson:10.0f} reports/s")
+    print(f"speedup: {single / single_rows * rows / bulk:.1f}x")
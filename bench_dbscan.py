@@ -0,0 +1,72 @@
+# bench_dbscan.py
+"""
+Time the DBSCAN hotspot pipeline (tasks.ml_clustering.cluster_points) on
+synthetic reports: storm-like blobs along the Indian coastline plus
+scattered background noise. No database is needed. The scaled-Euclidean
+version the task used before is timed alongside up to LEGACY_MAX points;
+beyond that its per-cluster scans take minutes.
+
+    python bench_dbscan.py [points ...] [--eps-km 1.0] [--min-samples 5]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from tasks.ml_clustering import cluster_points
+
+LEGACY_MAX = 100_000
+COAST = np.array([(8.1, 77.5), (13.1, 80.3), (17.7, 83.3), (21.6, 87.5), (19.1, 72.9), (15.4, 73.8), (9.9, 76.3)])
+TYPES = np.array(["Flood", "Storm", "Tsunami", "High Waves", "Oil Spill"])
+
+def synthetic(n, rng):
+    blobs = int(n * 0.8)
+    centres = COAST[rng.integers(len(COAST), size=max(1, n // 500))] + rng.normal(0, 1.0, size=(max(1, n // 500), 2))
+    pick = rng.integers(len(centres), size=blobs)
+    points = centres[pick] + rng.normal(0, 0.01, size=(blobs, 2))  # ~1 km spread per blob
+    noise = np.column_stack((rng.uniform(5, 23, n - blobs), rng.uniform(68, 90, n - blobs)))
+    points = np.vstack((points, noise))
+    return points[:, 0], points[:, 1], rng.integers(1, 11, n).astype(float), TYPES[rng.integers(len(TYPES), size=n)]
+
+def legacy(lat, lon, severity, types, eps=0.1, min_samples=5):
+    # The pre-vectorised task: scaled degrees, then one scan of the input per cluster
+    from sklearn.cluster import DBSCAN
+    from sklearn.preprocessing import StandardScaler
+
+    labels = DBSCAN(eps=eps, min_samples=min_samples).fit_predict(StandardScaler().fit_transform(np.column_stack((lat, lon))))
+    hazard_data = [{"latitude": a, "longitude": b, "severity": s, "hazard_type": t}
+                   for a, b, s, t in zip(lat.tolist(), lon.tolist(), severity.tolist(), types.tolist())]
+    clusters = []
+    for label in set(labels.tolist()) - {-1}:
+        members = [hazard_data[i] for i, l in enumerate(labels) if l == label]
+        clusters.append({
+            "point_count": len(members),
+            "hazard_types": list({h["hazard_type"] for h in members}),
+            "average_severity": sum(h["severity"] for h in members) / len(members),
+        })
+    return clusters
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("points", nargs="*", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--eps-km", type=float, default=1.0)
+    parser.add_argument("--min-samples", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    import sklearn.cluster  # noqa: F401  (keeps the one-off import out of the first timing)
+    for n in args.points:
+        lat, lon, severity, types = synthetic(n, rng)
+        elapsed, result = timed(cluster_points, lat, lon, severity, types, eps_km=args.eps_km, min_samples=args.min_samples)
+        stats = result["statistics"]
+        line = (f"{n:>9} points  haversine/ball_tree {elapsed:8.2f} s  "
+                f"{stats['n_clusters']:>6} clusters  {stats['n_noise']:>8} noise")
+        if n <= LEGACY_MAX:
+            legacy_elapsed, legacy_clusters = timed(legacy, lat, lon, severity, types, min_samples=args.min_samples)
+            line += f"  | scaled-euclidean loop {legacy_elapsed:8.2f} s  {len(legacy_clusters):>6} clusters"
+        print(line)
@@ -0,0 +1,84 @@
+# bench_dbscan_backends.py
+"""
+Time the generate_dbscan_hotspots backends over growing time windows:
+sklearn (points fetched and clustered in the worker), postgis
+(ST_ClusterDBSCAN, only cluster rows leave the database) and kmeans
+(ST_ClusterKMeans). Needs DATABASE_URL pointing at a migrated database.
+--seed spreads that many synthetic reports over the last week first; they
+are tagged "dbscan benchmark".
+
+    python bench_dbscan_backends.py [window hours ...] [--seed 100000] [--runs 3]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import crud, schemas
+from bench_dbscan import synthetic
+from database import SessionLocal
+from tasks.ml_clustering import postgis_hotspots, sklearn_hotspots
+
+SEED_BATCH = 10_000
+
+def seed(n):
+    rng = np.random.default_rng(7)
+    lat, lon, severity, types = synthetic(n, rng)
+    now = datetime.now(timezone.utc)
+    ages = rng.uniform(0, 7 * 24 * 3600, n)
+    db = SessionLocal()
+    try:
+        for start in range(0, n, SEED_BATCH):
+            batch = slice(start, start + SEED_BATCH)
+            hazards = [
+                schemas.HazardReportCreate(hazard_type=t, latitude=a, longitude=o, severity=int(s) // 2 or 1,
+                                           description="dbscan benchmark")
+                for a, o, s, t in zip(lat[batch].tolist(), lon[batch].tolist(), severity[batch].tolist(), types[batch].tolist())
+            ]
+            crud.bulk_create_hazard_reports(db, hazards, report_times=[now - timedelta(seconds=s) for s in ages[batch].tolist()])
+    finally:
+        db.close()
+
+def timed(fn, runs, *args, **kwargs):
+    timings, result = [], None
+    for _ in range(runs):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            result = fn(db, *args, **kwargs)
+            timings.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    return statistics.median(timings), result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("windows", nargs="*", type=float, default=[1, 6, 24, 72, 168])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--eps-km", type=float, default=1.0)
+    parser.add_argument("--min-samples", type=int, default=5)
+    parser.add_argument("--n-clusters", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+    import sklearn.cluster  # noqa: F401  (keeps the one-off import out of the first timing)
+
+    backends = {
+        "sklearn": lambda db, since: sklearn_hotspots(db, since, args.eps_km, args.min_samples),
+        "postgis": lambda db, since: postgis_hotspots(db, since, args.eps_km, args.min_samples),
+        "kmeans": lambda db, since: postgis_hotspots(db, since, algorithm="kmeans", n_clusters=args.n_clusters),
+    }
+    for hours in args.windows:
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        results = {name: timed(fn, args.runs, since) for name, fn in backends.items()}
+        points = results["sklearn"][1]["statistics"].get("total_points", 0)
+        cells = "  ".join(
+            f"{name} {elapsed * 1000:9.1f} ms ({result['statistics'].get('n_clusters', 0):>5} clusters)"
+            for name, (elapsed, result) in results.items()
+        )
+        fastest = min(("sklearn", "postgis"), key=lambda name: results[name][0])
+        print(f"{hours:>6g} h {points:>9} points  {cells}  -> DBSCAN faster: {fastest}")
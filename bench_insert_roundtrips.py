@@ -0,0 +1,87 @@
+# bench_insert_roundtrips.py
+"""
+Count SQL statements and time per call for the write helpers, comparing the
+old add/commit/refresh pattern with the INSERT ... RETURNING versions in crud.
+Needs DATABASE_URL pointing at a migrated database; the rows it writes are
+tagged "roundtrip benchmark".
+
+    python bench_insert_roundtrips.py [calls]
+"""
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from geoalchemy2.shape import from_shape
+from shapely.geometry import Point
+from sqlalchemy import event
+
+import crud, models, schemas
+from auth import crud as auth_crud, models as auth_models, schemas as auth_schemas
+from database import SessionLocal, engine
+
+statements = 0
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+def make_hazard():
+    return schemas.HazardReportCreate(
+        hazard_type="Flooding", latitude=13.0, longitude=80.3, severity=3, description="roundtrip benchmark"
+    )
+
+def refresh_hazard(db, hazard):
+    # What create_hazard_report did before RETURNING
+    db_hazard = models.HazardReport(
+        hazard_type=hazard.hazard_type,
+        geom=from_shape(Point(hazard.longitude, hazard.latitude), srid=4326),
+        severity=hazard.severity,
+        description=hazard.description,
+    )
+    db.add(db_hazard)
+    db.commit()
+    db.refresh(db_hazard)
+    crud.hazards_changed(db, [(hazard.longitude, hazard.latitude)])
+    return schemas.HazardReport.model_validate(db_hazard)
+
+def returning_hazard(db, hazard):
+    return schemas.HazardReport.model_validate(crud.create_hazard_report(db, hazard))
+
+def refresh_session(db, user_id):
+    session = auth_models.UserSession(user_id=user_id, token=uuid.uuid4().hex, expires_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session.created_at
+
+def returning_session(db, user_id):
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    return auth_crud.create_user_session(db, user_id, uuid.uuid4().hex, expires_at).created_at
+
+def run(name, fn, arg, calls):
+    global statements
+    db = SessionLocal()
+    try:
+        fn(db, arg)  # warm up the connection and statement cache
+        statements = 0
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn(db, arg)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    print(f"{name:<28} {statements / calls:5.1f} statements/call  {elapsed / calls * 1000:7.2f} ms/call")
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    db = SessionLocal()
+    user = auth_crud.create_user(db, auth_schemas.UserCreate(
+        email=f"bench-{uuid.uuid4().hex[:8]}@example.com", full_name="roundtrip benchmark", password="Bench#Pass1"
+    ))
+    db.close()
+    run("hazard: commit + refresh", refresh_hazard, make_hazard(), calls)
+    run("hazard: INSERT RETURNING", returning_hazard, make_hazard(), calls)
+    run("session: commit + refresh", refresh_session, user.id, calls)
+    run("session: INSERT RETURNING", returning_session, user.id, calls)
@@ -0,0 +1,43 @@
+# bench_startup.py
+"""
+Cold start cost of an API worker and a Celery worker: each case runs in a
+fresh interpreter, the way a restarted or newly scaled container would.
+No database is needed; nothing connects at import time.
+
+    python bench_startup.py [runs]
+"""
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+CASES = {
+    # What uvicorn does before it can accept connections
+    "api: import main": "import main",
+    # What a Celery worker does at boot: load the app and every task module
+    "worker: import task modules": "import celery_app; celery_app.celery.loader.import_default_modules()",
+    # The lazily loaded libraries, paid once per worker process on first use
+    "worker: first NLP analysis": "from tasks import nlp; nlp.get_analyzer().analyze_text('storm surge flooding near Chennai')",
+    "worker: first DBSCAN import": "import sklearn.cluster",
+}
+
+TIMER = "import time; start = time.perf_counter(); {code}; print(time.perf_counter() - start)"
+
+def measure(code):
+    result = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code)], cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, code in CASES.items():
+        timings = [measure(code) for _ in range(runs)]
+        if None in timings:
+            print(f"{name:<30} failed (missing dependency or NLTK data?)")
+            continue
+        print(f"{name:<30} median {statistics.median(timings) * 1000:8.1f} ms  max {max(timings) * 1000:8.1f} ms")
@@ -0,0 +1,145 @@
+# cache.py
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# memory: per-process LRU, redis: shared between API workers, none: disabled
+HAZARD_CACHE_BACKEND = os.getenv("HAZARD_CACHE_BACKEND", "memory")
+HAZARD_CACHE_URL = os.getenv("HAZARD_CACHE_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+HAZARD_CACHE_TTL = int(os.getenv("HAZARD_CACHE_TTL", "300"))
+HAZARD_CACHE_SIZE = int(os.getenv("HAZARD_CACHE_SIZE", "1024"))
+# A bbox is snapped outward to a power-of-two degree grid with this many steps across its span
+HAZARD_CACHE_BBOX_DIVISIONS = int(os.getenv("HAZARD_CACHE_BBOX_DIVISIONS", "4"))
+
+def snap_bbox(bbox: list[float], divisions: int = HAZARD_CACHE_BBOX_DIVISIONS) -> list[float]:
+    """
+    Expand bbox to a coarse grid so nearly identical viewports share one
+    cache entry. The grid step scales with the bbox size.
+    """
+    span = max(bbox[2] - bbox[0], bbox[3] - bbox[1], 1e-6)
+    step = 2.0 ** math.floor(math.log2(span / divisions))
+    return [
+        max(math.floor(bbox[0] / step) * step, -180.0),
+        max(math.floor(bbox[1] / step) * step, -90.0),
+        min(math.ceil(bbox[2] / step) * step, 180.0),
+        min(math.ceil(bbox[3] / step) * step, 90.0),
+    ]
+
+class MemoryBackend:
+    """
+    Process-local LRU. Entries of older data versions are never read again;
+    they fall out through the LRU or expire after ttl seconds.
+    """
+
+    blocking = False
+
+    def __init__(self, maxsize=HAZARD_CACHE_SIZE, ttl=HAZARD_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+class RedisBackend:
+    """Shared cache in the Redis already deployed for Celery"""
+
+    # redis-py waits on the socket; async callers run it in the threadpool
+    blocking = True
+
+    def __init__(self, url=HAZARD_CACHE_URL, ttl=HAZARD_CACHE_TTL):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value):
+        self.client.set(key, value, ex=self.ttl)
+
+class ResponseCache:
+    """
+    Serialized hazard responses keyed on endpoint, normalized parameters and
+    the data version, which is the hazard_change_seq value the ETag carries.
+    Every worker and writer shares that sequence, so a write orphans every
+    entry in every process at once; stale entries then age out through the
+    LRU or the TTL. Backend failures degrade to cache misses.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def make_key(self, namespace: str, version: int | None, **params):
+        # No version: the read may be older than any version, so it is not cached
+        if self.backend is None or version is None:
+            return None
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"hazards:v{version}:{namespace}:{digest}"
+
+    def get(self, key):
+        if key is None:
+            return None
+        try:
+            return self.backend.get(key)
+        except redis.RedisError as e:
+            logger.warning("hazard cache get failed: %s", e)
+            return None
+
+    def set(self, key, value):
+        if key is None:
+            return
+        try:
+            self.backend.set(key, value)
+        except redis.RedisError as e:
+            logger.warning("hazard cache set failed: %s", e)
+
+    async def get_async(self, key):
+        """get() for async endpoints: a network backend is called off the event loop"""
+        if key is not None and self.backend.blocking:
+            return await run_in_threadpool(self.get, key)
+        return self.get(key)
+
+    async def set_async(self, key, value):
+        if key is not None and self.backend.blocking:
+            await run_in_threadpool(self.set, key, value)
+        else:
+            self.set(key, value)
+
+def _make_backend(name):
+    if name == "redis":
+        return RedisBackend()
+    if name == "memory":
+        return MemoryBackend()
+    return None
+
+hazard_cache = ResponseCache(_make_backend(HAZARD_CACHE_BACKEND))
@@ -1,5 +1,6 @@
 # celery_app.py
 from celery import Celery
+from celery.signals import worker_process_init
 import os
 from dotenv import load_dotenv
 
@@ -10,7 +11,7 @@ celery = Celery(
     "ocean_hazard_tasks",
     broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0"),
-    include=["tasks.social_media", "tasks.nlp", "tasks.hotspots"]
+    include=["tasks.social_media", "tasks.nlp", "tasks.hotspots", "tasks.ml_clustering", "tasks.ingest", "tasks.partitions", "tasks.media", "tasks.incremental_hotspots", "tasks.hex_pyramid"]
 )
 
 # Optional configuration
@@ -22,7 +23,33 @@ celery.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
+    beat_schedule={
+        # Only does work when HAZARD_INGEST_MODE=buffered puts reports on the stream
+        "flush-hazard-ingest": {
+            "task": "tasks.ingest.flush_hazard_ingest",
+            "schedule": float(os.getenv("INGEST_FLUSH_INTERVAL", "1.0")),
+        },
+        # Cheap when little changed; overlapping runs skip (see tasks/incremental_hotspots.py)
+        "refresh-hotspots": {
+            "task": "tasks.incremental_hotspots.refresh_hotspots",
+            "schedule": float(os.getenv("HOTSPOT_REFRESH_SECONDS", "5.0")),
+        },
+        "refresh-hex-pyramid": {
+            "task": "tasks.hex_pyramid.refresh_hex_pyramid",
+            "schedule": float(os.getenv("HEX_REFRESH_SECONDS", "60.0")),
+        },
+        "maintain-hazard-partitions": {
+            "task": "tasks.partitions.maintain_hazard_partitions",
+            "schedule": 3600.0,
+        },
+    },
 )
 
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    # Prefork children must not share the parent's pooled connections
+    from database import engine
+    engine.dispose(close=False)
+
 if __name__ == "__main__":
     celery.start()
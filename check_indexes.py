@@ -0,0 +1,117 @@
+# check_indexes.py
+"""
+EXPLAIN the hot hazard queries and check each one can be served by the
+index it was built for. Sequential scans are disabled for the check so a
+small development table still shows which index the planner would pick.
+
+    python check_indexes.py
+"""
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, func, text
+
+import crud
+import models
+import auth.models  # noqa: F401  (registers User for the HazardReport relationship)
+from database import engine
+
+hr = models.HazardReport
+now = datetime.now(timezone.utc)
+india = [68.0, 6.5, 97.5, 35.5]
+
+HOT_QUERIES = [
+    (
+        "geojson page, newest first",
+        crud._hazard_page(crud.hazard_row_columns(), None, 100, 0, None),
+        "ix_hazard_reports_report_time_id",
+    ),
+    (
+        "geojson page after cursor",
+        crud._hazard_page(crud.hazard_row_columns(), None, 100, 0, crud.encode_cursor(now, uuid.uuid4())),
+        "ix_hazard_reports_report_time_id",
+    ),
+    (
+        "bbox filter",
+        select(hr.id).where(*crud.hazard_report_filters(india)),
+        "idx_hazard_reports_geom",
+    ),
+    (
+        "hotspot time window",
+        select(hr.id, hr.hazard_type, hr.severity).where(hr.report_time >= now - timedelta(hours=24)),
+        "ix_hazard_reports_report_time_id",
+    ),
+    (
+        "hazard type in window",
+        select(hr.id).where(*crud.hazard_report_filters(since=now - timedelta(hours=6), hazard_types=["flood", "storm surge"])),
+        "ix_hazard_reports_hazard_type_report_time",
+    ),
+    (
+        "last 6 hours, severity >= 4",
+        select(hr.id).where(*crud.hazard_report_filters(since=now - timedelta(hours=6), min_severity=4)),
+        "ix_hazard_reports_severe_report_time",
+    ),
+    (
+        "user report history",
+        select(hr.id).where(hr.user_id == uuid.uuid4(), hr.report_time >= now - timedelta(days=30)).order_by(hr.report_time.desc()),
+        "ix_hazard_reports_user_id_report_time",
+    ),
+    (
+        "hotspot refresh watermark",
+        select(hr.id).where(hr.created_at > now - timedelta(seconds=30), hr.report_time >= now - timedelta(hours=24)),
+        "ix_hazard_reports_created_at",
+    ),
+    (
+        "hexagon pyramid window",
+        select(models.HazardHexAggregate.q).where(
+            models.HazardHexAggregate.resolution == 5,
+            models.HazardHexAggregate.bucket_width == "hour",
+            models.HazardHexAggregate.bucket_start >= now - timedelta(hours=6),
+        ),
+        "hazard_hex_aggregates_pkey",
+    ),
+    (
+        "vector tile",
+        select(hr.id).where(hr.geom.op("&&")(func.ST_Transform(func.ST_TileEnvelope(6, 45, 28), 4326))),
+        "idx_hazard_reports_geom",
+    ),
+]
+
+def plan_indexes(node):
+    found = set()
+    if "Index Name" in node:
+        found.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        found |= plan_indexes(child)
+    return found
+
+def parent_indexes(conn, names):
+    """hazard_reports is partitioned: plans name the per-partition indexes, report the partitioned ones (others as they are)"""
+    if not names:
+        return set()
+    return set(conn.execute(text("""
+        SELECT COALESCE(pg_partition_root(c.oid), c.oid)::regclass::text FROM pg_class c WHERE c.relname = ANY(:names)
+    """), {"names": list(names)}).scalars())
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=engine.dialect)
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+def main():
+    failures = 0
+    with engine.connect() as conn:
+        conn.execute(text("SET enable_seqscan = off"))
+        for name, stmt, expected in HOT_QUERIES:
+            used = parent_indexes(conn, plan_indexes(explain(conn, stmt)))
+            ok = expected in used
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {name:32} expected {expected}, plan uses {sorted(used) or 'no index'}")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
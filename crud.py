@@ -1,29 +1,679 @@
-# crud.py
 from sqlalchemy.orm import Session
-from sqlalchemy import func, select
+from sqlalchemy import and_, or_, func, select, update, delete, union_all, literal_column, tuple_, text, true, bindparam, column, Text, BigInteger, Integer, String, Float, DateTime
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, array_agg, insert as pg_insert
+from datetime import datetime, timedelta, timezone
+import base64
+import json
+import math
+import os
+import uuid
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
 import models, schemas
+import tiles
+
+# Ingest dedup: a report of the same type within this many metres and
+# minutes of an existing one is merged into it. A radius of 0 disables it.
+DEDUP_RADIUS_M = float(os.getenv("HAZARD_DEDUP_RADIUS_M", "100"))
+DEDUP_WINDOW_MINUTES = float(os.getenv("HAZARD_DEDUP_WINDOW_MINUTES", "30"))
+# Merge records of buffered submissions live as long as their ingest status keys
+MERGE_RECORD_TTL = timedelta(days=7)
+EARTH_RADIUS_M = 6371008.8
+
+def find_duplicate_report(hazard: schemas.HazardReportCreate, radius_m: float = DEDUP_RADIUS_M,
+                          window_minutes: float = DEDUP_WINDOW_MINUTES):
+    """
+    Closest report of the same hazard_type within radius_m metres and the
+    last window_minutes, as a scalar subquery of its id. The geometry bbox
+    test uses the GiST index; the geography ST_DWithin then checks the
+    real distance. Rows another transaction is merging into are skipped.
+    """
+    hr = models.HazardReport
+    point = func.ST_SetSRID(func.ST_MakePoint(hazard.longitude, hazard.latitude), 4326)
+    # Degrees of longitude shrink towards the poles; widen the box to match
+    expand_deg = radius_m / (111320.0 * max(math.cos(math.radians(hazard.latitude)), 0.01))
+    return (
+        select(hr.id)
+        .where(
+            hr.hazard_type == hazard.hazard_type,
+            hr.report_time >= func.now() - timedelta(minutes=window_minutes),
+            hr.geom.op("&&")(func.ST_Expand(point, expand_deg)),
+            func.ST_DWithin(func.geography(hr.geom), func.geography(point), radius_m),
+        )
+        .order_by(func.ST_Distance(func.geography(hr.geom), func.geography(point)))
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
 
 def create_hazard_report(db: Session, hazard: schemas.HazardReportCreate):
-    point = from_shape(Point(hazard.longitude, hazard.latitude), srid=4326)
-    db_hazard = models.HazardReport(
-        hazard_type=hazard.hazard_type,
-        geom=point,
-        severity=hazard.severity,
-        description=hazard.description
-    )
-    db.add(db_hazard)
+    """
+    Insert one report, or merge it into a recent report of the same type
+    nearby by bumping that report's corroboration_count. Either way the row
+    comes back through RETURNING, not a refresh.
+    """
+    db_hazard = None
+    if DEDUP_RADIUS_M > 0:
+        hr = models.HazardReport
+        merge = (
+            update(hr.__table__)
+            # The partition key bound lets the UPDATE skip partitions outside the window
+            .where(hr.id == find_duplicate_report(hazard),
+                   hr.report_time >= func.now() - timedelta(minutes=DEDUP_WINDOW_MINUTES))
+            .values(
+                corroboration_count=hr.corroboration_count + 1,
+                last_corroborated_at=func.now(),
+                severity=func.greatest(hr.severity, hazard.severity),
+            )
+            .returning(*hazard_row_columns())
+        )
+        db_hazard = db.execute(merge).one_or_none()
+    if db_hazard is None:
+        point = from_shape(Point(hazard.longitude, hazard.latitude), srid=4326)
+        stmt = (
+            pg_insert(models.HazardReport.__table__)
+            .values(
+                hazard_type=hazard.hazard_type,
+                geom=point,
+                severity=hazard.severity,
+                description=hazard.description,
+            )
+            .returning(*hazard_row_columns())
+        )
+        db_hazard = db.execute(stmt).one()
     db.commit()
-    db.refresh(db_hazard)
+    hazards_changed(db, [(db_hazard.longitude, db_hazard.latitude)])
     return db_hazard
 
-def get_hazard_reports(db: Session, bbox: list[float] | None = None, limit: int = 100, skip: int = 0):
-    # bbox expected as [minLon, minLat, maxLon, maxLat]
+def group_batch_duplicates(hazards: list[schemas.HazardReportCreate], report_times: list[datetime] | None = None,
+                           radius_m: float = DEDUP_RADIUS_M, window_minutes: float = DEDUP_WINDOW_MINUTES) -> list[int]:
+    """
+    Dedup within a batch, which merge_duplicate_reports cannot see: each
+    report folds into the closest earlier report of the batch that has the
+    same hazard_type, lies within radius_m and is within window_minutes of
+    it (all reports count as simultaneous without report_times). Only
+    reports that did not fold themselves take others in, so groups do not
+    chain. Returns, per index, the index of the report it folds into (its
+    own for the ones that stay).
+    """
+    # Points on the sphere, bucketed in radius_m cubes: a chord is never
+    # longer than its arc, so every match lies in one of the 27 cubes around
+    max_chord = 2 * math.sin(radius_m / (2 * EARTH_RADIUS_M))
+    window = timedelta(minutes=window_minutes)
+    cells, points, groups = {}, [], []
+    for index, hazard in enumerate(hazards):
+        lat, lon = math.radians(hazard.latitude), math.radians(hazard.longitude)
+        point = (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+        points.append(point)
+        cell = tuple(math.floor(c * EARTH_RADIUS_M / radius_m) for c in point)
+        best = (max_chord, index)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for other in cells.get((hazard.hazard_type, cell[0] + dx, cell[1] + dy, cell[2] + dz), ()):
+                        if report_times and abs(report_times[index] - report_times[other]) > window:
+                            continue
+                        # Ties go to the earlier report
+                        best = min(best, (math.dist(point, points[other]), other))
+        groups.append(best[1])
+        if best[1] == index:
+            cells.setdefault((hazard.hazard_type, *cell), []).append(index)
+    return groups
+
+def merge_duplicate_reports(db: Session, hazards: list[schemas.HazardReportCreate],
+                            report_times: list[datetime] | None = None, radius_m: float = DEDUP_RADIUS_M,
+                            window_minutes: float = DEDUP_WINDOW_MINUTES,
+                            counts: list[int] | None = None) -> dict[int, uuid.UUID]:
+    """
+    Set-based find_duplicate_report for a batch: one statement unnests the
+    batch, finds each report's closest stored duplicate through a LATERAL
+    lookup on the same indexes, and bumps every matched report once by the
+    number of reports merged into it. The window is measured back from each
+    report's own report_time (now when not given). counts gives how many
+    submissions each report stands for after group_batch_duplicates (1 by
+    default). Returns {batch index: (id, longitude, latitude) of the report
+    merged into}.
+    """
+    hr = models.HazardReport
+    columns = [column("hazard_type", String), column("longitude", Float), column("latitude", Float), column("severity", Integer),
+               column("reports", Integer)]
+    arrays = [
+        bindparam("hazard_types", [h.hazard_type for h in hazards], type_=ARRAY(String)),
+        bindparam("longitudes", [h.longitude for h in hazards], type_=ARRAY(Float)),
+        bindparam("latitudes", [h.latitude for h in hazards], type_=ARRAY(Float)),
+        bindparam("severities", [h.severity for h in hazards], type_=ARRAY(Integer)),
+        bindparam("counts", counts or [1] * len(hazards), type_=ARRAY(Integer)),
+    ]
+    if report_times:
+        columns.append(column("report_time", DateTime(timezone=True)))
+        arrays.append(bindparam("report_times", report_times, type_=ARRAY(DateTime(timezone=True))))
+    incoming = func.unnest(*arrays).table_valued(*columns, with_ordinality="idx").render_derived(name="incoming")
+    at = incoming.c.report_time if report_times else func.now()
+
+    point = func.ST_SetSRID(func.ST_MakePoint(incoming.c.longitude, incoming.c.latitude), 4326)
+    expand_deg = radius_m / (111320.0 * func.greatest(func.cos(func.radians(incoming.c.latitude)), 0.01))
+    duplicate = (
+        select(hr.id, hr.report_time)
+        .where(
+            hr.hazard_type == incoming.c.hazard_type,
+            hr.report_time >= at - timedelta(minutes=window_minutes),
+            hr.geom.op("&&")(func.ST_Expand(point, expand_deg)),
+            func.ST_DWithin(func.geography(hr.geom), func.geography(point), radius_m),
+        )
+        .order_by(func.ST_Distance(func.geography(hr.geom), func.geography(point)))
+        .limit(1)
+        .lateral("duplicate")
+    )
+    matched = (
+        select(incoming.c.idx, incoming.c.severity, incoming.c.reports, duplicate.c.id, duplicate.c.report_time)
+        .select_from(incoming.join(duplicate, true()))
+        .cte("matched")
+    )
+    merged = (
+        select(matched.c.id, matched.c.report_time, func.sum(matched.c.reports).label("reports"), func.max(matched.c.severity).label("severity"))
+        .group_by(matched.c.id, matched.c.report_time)
+        .subquery()
+    )
+    bump = (
+        update(hr.__table__)
+        .where(hr.id == merged.c.id, hr.report_time == merged.c.report_time)
+        .values(
+            corroboration_count=hr.corroboration_count + merged.c.reports,
+            last_corroborated_at=func.now(),
+            severity=func.greatest(hr.severity, merged.c.severity),
+        )
+        .returning(hr.id, hr.report_time, hr.longitude, hr.latitude)
+        .cte("bump")
+    )
+    rows = db.execute(
+        select(matched.c.idx, bump.c.id, bump.c.longitude, bump.c.latitude)
+        .join_from(matched, bump, and_(bump.c.id == matched.c.id, bump.c.report_time == matched.c.report_time))
+    ).all()
+    # WITH ORDINALITY counts from 1
+    return {idx - 1: (report_id, lon, lat) for idx, report_id, lon, lat in rows}
+
+def handled_submissions(db: Session, ids: list[uuid.UUID], report_times: list[datetime] | None = None) -> dict[uuid.UUID, uuid.UUID]:
+    """Which of these submission ids are already stored or merged: {submission id: report id}"""
+    hr = models.HazardReport
+    merges = models.HazardReportMerge
+    stored = select(hr.id, hr.id).where(hr.id.in_(ids))
+    if report_times:
+        stored = stored.where(hr.report_time.between(min(report_times), max(report_times)))
+    merged = select(merges.submission_id, merges.report_id).where(merges.submission_id.in_(ids))
+    return dict(db.execute(union_all(stored, merged)).all())
+
+def bulk_create_hazard_reports(db: Session, hazards: list[schemas.HazardReportCreate],
+                               ids: list[uuid.UUID] | None = None, report_times: list[datetime] | None = None,
+                               dedup: bool = False, user_id: uuid.UUID | None = None) -> tuple[list[uuid.UUID], set[int]]:
+    """
+    Insert many reports in one transaction. The executemany is batched into
+    multi-row INSERTs by the driver, and ids are assigned here so nothing
+    has to be read back.
+
+    With dedup, duplicates within the batch are folded together first
+    (group_batch_duplicates): each group goes on as its first report, with
+    the group's size as corroboration_count and its highest severity. Groups
+    duplicating a stored report are then merged into it
+    (merge_duplicate_reports) and only the rest are inserted. Returns the
+    id of every report, the one it was merged into for merged reports, and
+    the indexes of the merged reports. user_id is recorded as the submitter
+    of the inserted rows.
+
+    Callers replaying work (the buffered ingest flusher) pass their own ids
+    and report_times; rows that already exist are skipped and merges are
+    recorded in hazard_report_merges, so a replay neither duplicates a row
+    nor counts a merge twice.
+    """
+    replay = ids is not None
+    ids = list(ids or [uuid.uuid4() for _ in hazards])
+    if not hazards:
+        return ids, set()
+    merged, groups, bumped = {}, {}, []
+    if dedup and DEDUP_RADIUS_M > 0:
+        handled = handled_submissions(db, ids, report_times) if replay else {}
+        pending = [index for index, hazard_id in enumerate(ids) if hazard_id not in handled]
+        if pending:
+            folds_into = group_batch_duplicates(
+                [hazards[i] for i in pending], [report_times[i] for i in pending] if report_times else None
+            )
+            for k, lead in enumerate(folds_into):
+                groups.setdefault(pending[lead], []).append(pending[k])
+            leads = list(groups)
+            found = merge_duplicate_reports(
+                db,
+                [hazards[i].model_copy(update={"severity": max(hazards[j].severity for j in groups[i])}) for i in leads],
+                [report_times[i] for i in leads] if report_times else None,
+                counts=[len(groups[i]) for i in leads],
+            )
+            for k, (report_id, lon, lat) in found.items():
+                merged.update((index, report_id) for index in groups.pop(leads[k]))
+                bumped.append((lon, lat))
+            # Groups left are inserted as their lead, the rest of each group merged into it
+            for lead, group in groups.items():
+                merged.update((index, ids[lead]) for index in group[1:])
+        if replay and merged:
+            merges = models.HazardReportMerge.__table__
+            db.execute(pg_insert(merges), [{"submission_id": ids[i], "report_id": report_id} for i, report_id in merged.items()])
+            db.execute(delete(merges).where(merges.c.merged_at < func.now() - MERGE_RECORD_TTL))
+        # Merged by an earlier attempt: report it as merged again, insert nothing
+        merged.update({i: handled[hazard_id] for i, hazard_id in enumerate(ids) if handled.get(hazard_id, hazard_id) != hazard_id})
+    rows = [
+        {
+            "id": hazard_id,
+            "hazard_type": hazard.hazard_type,
+            "geom": f"SRID=4326;POINT({hazard.longitude} {hazard.latitude})",
+            "severity": hazard.severity,
+            "description": hazard.description,
+            "user_id": user_id,
+            "corroboration_count": 1,
+            "last_corroborated_at": None,
+        }
+        for hazard_id, hazard in zip(ids, hazards)
+    ]
+    if report_times:
+        for row, report_time in zip(rows, report_times):
+            row["report_time"] = report_time
+    for lead, group in groups.items():
+        if len(group) > 1:
+            rows[lead]["corroboration_count"] = len(group)
+            rows[lead]["severity"] = max(hazards[i].severity for i in group)
+            rows[lead]["last_corroborated_at"] = max(report_times[i] for i in group) if report_times else datetime.now(timezone.utc)
+    rows = [row for index, row in enumerate(rows) if index not in merged]
+    if rows:
+        db.execute(pg_insert(models.HazardReport.__table__).on_conflict_do_nothing(), rows)
+    db.commit()
+    hazards_changed(db, [(hazard.longitude, hazard.latitude) for index, hazard in enumerate(hazards) if index not in merged] + bumped)
+    for index, report_id in merged.items():
+        ids[index] = report_id
+    return ids, set(merged)
+
+def hazard_report_exists(db: Session, report_id: uuid.UUID, report_time: datetime | None = None) -> bool:
+    """Whether the report is stored; its report_time, when known, limits the probe to one partition"""
+    hr = models.HazardReport
+    stmt = select(hr.id).where(hr.id == report_id)
+    if report_time is not None:
+        stmt = stmt.where(hr.report_time == report_time)
+    return db.scalar(stmt.limit(1)) is not None
+
+def get_merged_report_id(db: Session, submission_id: uuid.UUID) -> uuid.UUID | None:
+    """Report a buffered submission was merged into, while its merge record is kept"""
+    merges = models.HazardReportMerge
+    return db.scalar(select(merges.report_id).where(merges.submission_id == submission_id))
+
+def create_media(db: Session, **values):
+    """Record a stored upload; the row comes back through RETURNING"""
+    stmt = pg_insert(models.Media.__table__).values(**values).returning(*models.Media.__table__.c)
+    media = db.execute(stmt).one()
+    db.commit()
+    return media
+
+def get_media(db: Session, media_id: uuid.UUID):
+    return db.get(models.Media, media_id)
+
+def set_media_preview(db: Session, media_id: uuid.UUID, preview_path: str):
+    db.execute(update(models.Media.__table__).where(models.Media.id == media_id).values(preview_path=preview_path))
+    db.commit()
+
+def hazards_changed(db: Session, points):
+    """
+    Move the data versions behind ETags and cached reads after hazard rows
+    at these (lon, lat) points were committed: the global change sequence,
+    and the version of every tile containing one of the points.
+    """
+    # Only after commit: a reader that sees the new sequence value must also see the rows
+    version = db.execute(select(models.hazard_change_seq.next_value())).scalar_one()
+    changed = sorted(tiles.changed_tiles(points))
+    if changed:
+        zs, xs, ys = zip(*changed)
+        versions = models.HazardTileVersion.__table__
+        source = select(
+            func.unnest(bindparam("zs", list(zs), type_=ARRAY(Integer))),
+            func.unnest(bindparam("xs", list(xs), type_=ARRAY(Integer))),
+            func.unnest(bindparam("ys", list(ys), type_=ARRAY(Integer))),
+            bindparam("version", version, type_=BigInteger),
+        )
+        stmt = pg_insert(versions).from_select(["z", "x", "y", "version"], source)
+        # Sorted rows take their locks in one order, and a writer that drew an
+        # older value but commits later never moves a tile back
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["z", "x", "y"],
+            set_={"version": func.greatest(versions.c.version, stmt.excluded.version)},
+        ))
+    db.commit()
+
+def get_hazard_change_seq(db: Session, tile: tuple[int, int, int] | None = None) -> int:
+    """Global change sequence value, or that of the last write inside tile (z, x, y)"""
+    if tile is not None:
+        return db.scalar(select(tile_version(*tile)))
+    # last_value of a sequence nextval() never ran on is its start value, not a change
+    return db.execute(text("SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM hazard_change_seq")).scalar_one()
+
+def get_hazard_change_position(db: Session, tile: tuple[int, int, int] | None = None) -> tuple[int, str]:
+    """get_hazard_change_seq and the primary's WAL position when it was read"""
+    if tile is not None:
+        return tuple(db.execute(select(tile_version(*tile), literal_column("pg_current_wal_lsn()::text"))).one())
+    return tuple(db.execute(text(
+        "SELECT CASE WHEN is_called THEN last_value ELSE 0 END, pg_current_wal_lsn()::text FROM hazard_change_seq"
+    )).one())
+
+def tile_version(z: int, x: int, y: int):
+    # Tiles nothing was written to since hazard_tile_versions was created have no row
+    v = models.HazardTileVersion
+    return func.coalesce(select(v.version).where(v.z == z, v.x == x, v.y == y).scalar_subquery(), 0)
+
+def replica_has_replayed(db: Session, lsn: str) -> bool:
+    """Whether this standby has replayed the primary's WAL up to lsn"""
+    return db.execute(
+        text("SELECT coalesce(pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), false)"), {"lsn": lsn}
+    ).scalar_one()
+
+def get_hotspots(db: Session, limit: int = 100, min_points: int = 1):
+    """Hotspots maintained by tasks/incremental_hotspots.py, largest first, in the DBSCAN task's output format"""
+    c = models.HotspotCluster
+    rows = db.execute(
+        select(c).where(c.point_count >= min_points).order_by(c.point_count.desc(), c.id).limit(limit)
+    ).scalars().all()
+    state = db.get(models.HotspotState, 1)
+    return {
+        "clusters": [
+            {
+                "cluster_id": row.id,
+                "center": {"latitude": row.latitude, "longitude": row.longitude},
+                "point_count": row.point_count,
+                "hazard_types": row.hazard_types,
+                "average_severity": row.average_severity,
+                "first_report_time": row.first_report_time,
+                "last_report_time": row.last_report_time,
+            }
+            for row in rows
+        ],
+        "statistics": {
+            "n_clusters": len(rows),
+            "algorithm": "DBSCAN (incremental)",
+            "parameters": {"eps_km": state.eps_km, "min_samples": state.min_samples, "window_hours": state.window_hours} if state else None,
+            "refreshed_at": state.refreshed_at if state else None,
+            "rebuilt_at": state.rebuilt_at if state else None,
+        },
+    }
+
+def hex_window(since: datetime, until: datetime, hour_horizon: datetime | None = None):
+    """
+    Buckets covering [since, until) snapped to whole hours: whole days from
+    the day buckets, the hours either side from the hour buckets. Returns
+    (hour_start, day_start, day_end, hour_end); hour rows are read from
+    [hour_start, day_start) and [day_end, hour_end).
+
+    Hour buckets older than hour_horizon have been expired, so an edge that
+    reaches before it widens to whole days. Buckets are cut in UTC; aware
+    since and until in other zones are converted first.
+    """
+    since, until = since.astimezone(timezone.utc), until.astimezone(timezone.utc)
+    hour_start = since.replace(minute=0, second=0, microsecond=0)
+    hour_end = until.replace(minute=0, second=0, microsecond=0)
+    if hour_end < until:
+        hour_end += timedelta(hours=1)
+    if hour_horizon is not None:
+        if hour_start < hour_horizon:
+            hour_start = hour_start.replace(hour=0)
+        if hour_end.replace(hour=0) < min(hour_horizon, hour_end):
+            hour_end = hour_end.replace(hour=0) + timedelta(days=1)
+    day_start = hour_start.replace(hour=0)
+    if day_start < hour_start:
+        day_start += timedelta(days=1)
+    day_end = hour_end.replace(hour=0)
+    if day_start >= day_end:
+        day_start = day_end = hour_end
+    return hour_start, day_start, day_end, hour_end
+
+def get_hex_hotspots(db: Session, resolution: int, since: datetime, until: datetime, bbox: list[float] | None = None,
+                     hazard_types: list[str] | None = None, min_reports: int = 1):
+    """Hexagons of one resolution over a time window from hazard_hex_aggregates, as GeoJSON with intensity"""
+    # Same weighting as the grid hotspots; the task module is only loaded when this endpoint is used
+    from tasks.hotspots import calculate_intensity
+    from tasks.hex_pyramid import horizons
+    import hexgrid
+
+    t = models.HazardHexAggregate
+    # An hour of slack: the refresh task expires buckets on the database clock
+    hour_horizon = horizons(datetime.now(timezone.utc))["hour"] + timedelta(hours=1)
+    hour_start, day_start, day_end, hour_end = hex_window(since, until, hour_horizon)
+    in_window = or_(
+        and_(t.bucket_width == "day", t.bucket_start >= day_start, t.bucket_start < day_end),
+        and_(t.bucket_width == "hour", or_(
+            and_(t.bucket_start >= hour_start, t.bucket_start < day_start),
+            and_(t.bucket_start >= day_end, t.bucket_start < hour_end),
+        )),
+    )
+    filters = [t.resolution == resolution, in_window]
+    if bbox:
+        filters += [t.longitude.between(bbox[0], bbox[2]), t.latitude.between(bbox[1], bbox[3])]
+    if hazard_types:
+        filters.append(t.hazard_type.in_(hazard_types))
+    count = func.sum(t.report_count)
+    rows = db.execute(
+        select(t.q, t.r, count, func.sum(t.severity_sum), func.sum(t.severity_count), func.max(t.max_severity),
+               array_agg(aggregate_order_by(t.hazard_type.distinct(), t.hazard_type)))
+        .where(*filters).group_by(t.q, t.r).having(count >= min_reports)
+    ).all()
+
+    features = []
+    for q, r, n, severity_sum, severity_count, max_severity, types in rows:
+        average_severity = severity_sum / severity_count if severity_count else 0.0
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [hexgrid.boundary(q, r, resolution)]},
+            "properties": {
+                "id": f"hex_{resolution}_{q}_{r}",
+                "resolution": resolution,
+                "count": n,
+                "average_severity": round(average_severity, 2),
+                "max_severity": max_severity,
+                "hazard_types": types,
+                "intensity": calculate_intensity(n, average_severity),
+            },
+        })
+    features.sort(key=lambda f: f["properties"]["intensity"], reverse=True)
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "window": {"since": hour_start, "until": hour_end},
+    }
+
+def hazard_report_filters(bbox: list[float] | None = None, since: datetime | None = None, until: datetime | None = None,
+                          hazard_types: list[str] | None = None, min_severity: int | None = None):
+    """
+    WHERE clauses shared by every hazard read and the hotspot tasks, so the
+    filtering happens in SQL on the indexes in migrations/0004.
+    bbox is [minLon, minLat, maxLon, maxLat]; since is inclusive, until exclusive.
+    """
+    hr = models.HazardReport
+    filters = []
     if bbox:
         env = func.ST_MakeEnvelope(bbox[0], bbox[1], bbox[2], bbox[3], 4326)
-        q = select(models.HazardReport).where(func.ST_Intersects(models.HazardReport.geom, env)).order_by(models.HazardReport.report_time.desc()).offset(skip).limit(limit)
-    else:
-        q = select(models.HazardReport).order_by(models.HazardReport.report_time.desc()).offset(skip).limit(limit)
+        filters.append(func.ST_Intersects(hr.geom, env))
+    if since:
+        filters.append(hr.report_time >= since)
+    if until:
+        filters.append(hr.report_time < until)
+    if hazard_types:
+        filters.append(hr.hazard_type.in_(hazard_types))
+    if min_severity is not None:
+        filters.append(hr.severity >= min_severity)
+    return filters
+
+def get_hazard_reports(db: Session, bbox: list[float] | None = None, limit: int = 100, skip: int = 0, **filters):
+    q = select(models.HazardReport).where(*hazard_report_filters(bbox, **filters)).order_by(models.HazardReport.report_time.desc(), models.HazardReport.id.desc()).offset(skip).limit(limit)
     result = db.execute(q).scalars().all()
     return result
+
+def _json_object(**pairs):
+    # json_build_object with literal keys; bound string params are untyped and
+    # postgres refuses them as arguments of the variadic "any" signature
+    args = []
+    for key, value in pairs.items():
+        args.extend([literal_column(f"'{key}'"), value])
+    return func.json_build_object(*args)
+
+def hazard_feature_json(source):
+    """GeoJSON Feature for one hazard row, assembled by PostGIS."""
+    return _json_object(
+        type=literal_column("'Feature'"),
+        # Built from the stored lon/lat columns; no geometry is decoded per row
+        geometry=_json_object(
+            type=literal_column("'Point'"),
+            coordinates=func.json_build_array(source.c.longitude, source.c.latitude),
+        ),
+        properties=_json_object(
+            id=source.c.id.cast(Text),
+            hazard_type=source.c.hazard_type,
+            severity=source.c.severity,
+            description=source.c.description,
+            report_time=source.c.report_time,
+            corroboration_count=source.c.corroboration_count,
+        ),
+    )
+
+def encode_cursor(report_time, report_id) -> str:
+    raw = f"{report_time.isoformat()}|{report_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    report_time, report_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    return datetime.fromisoformat(report_time), uuid.UUID(report_id)
+
+def _hazard_page(columns, bbox: list[float] | None, limit: int, skip: int, cursor: str | None, **filters):
+    """Newest-first page on (report_time, id), continuing after cursor when one is given."""
+    hr = models.HazardReport
+    q = select(*columns).where(*hazard_report_filters(bbox, **filters))
+    if cursor:
+        after_time, after_id = decode_cursor(cursor)
+        # The plain bound lets the planner prune partitions; the row comparison does not
+        q = q.where(hr.report_time <= after_time, tuple_(hr.report_time, hr.id) < tuple_(after_time, after_id))
+    return q.order_by(hr.report_time.desc(), hr.id.desc()).offset(skip).limit(limit)
+
+def get_hazard_geojson(db: Session, bbox: list[float] | None = None, limit: int = 100, skip: int = 0,
+                       cursor: str | None = None, **filters) -> str:
+    """Return a page of hazards as a serialized FeatureCollection in one round trip.
+
+    Pages are ordered newest first on (report_time, id). Passing the returned
+    next_cursor continues from the last row of the previous page via the
+    composite index instead of re-scanning skipped rows.
+    """
+    page = _hazard_page(hazard_row_columns(), bbox, limit, skip, cursor, **filters).subquery()
+
+    features = func.json_agg(aggregate_order_by(hazard_feature_json(page), page.c.report_time.desc(), page.c.id.desc()))
+    oldest_first = (page.c.report_time.asc(), page.c.id.asc())
+    # Cast to text so the driver hands back the string instead of decoding it
+    stmt = select(
+        func.coalesce(features, literal_column("'[]'::json")).cast(Text),
+        func.count(),
+        array_agg(aggregate_order_by(page.c.report_time, *oldest_first))[1],
+        array_agg(aggregate_order_by(page.c.id, *oldest_first))[1],
+    ).select_from(page)
+    features_json, count, last_time, last_id = db.execute(stmt).one()
+
+    next_cursor = encode_cursor(last_time, last_id) if limit and count == limit else None
+    return '{"type": "FeatureCollection", "features": %s, "next_cursor": %s}' % (features_json, json.dumps(next_cursor))
+
+def hazard_row_columns():
+    """Plain columns of a hazard row: coordinates are the stored lon/lat floats, not geometry"""
+    hr = models.HazardReport
+    return (
+        hr.id, hr.hazard_type, hr.severity, hr.description, hr.report_time,
+        hr.longitude, hr.latitude, hr.corroboration_count,
+    )
+
+def get_hazard_rows(db: Session, bbox: list[float] | None = None, limit: int = 100, skip: int = 0,
+                    cursor: str | None = None, **filters):
+    """Same page as get_hazard_geojson as plain rows, with its next_cursor"""
+    rows = db.execute(_hazard_page(hazard_row_columns(), bbox, limit, skip, cursor, **filters)).all()
+    next_cursor = encode_cursor(rows[-1].report_time, rows[-1].id) if limit and len(rows) == limit else None
+    return rows, next_cursor
+
+def iter_hazard_rows(db: Session, bbox: list[float] | None = None, batch_size: int = 1000, **filters):
+    """Like iter_hazard_features but yields batches of plain rows"""
+    stmt = select(*hazard_row_columns()).where(*hazard_report_filters(bbox, **filters)).execution_options(yield_per=batch_size)
+    yield from db.execute(stmt).partitions()
+
+def iter_hazard_features(db: Session, bbox: list[float] | None = None, batch_size: int = 1000, **filters):
+    """Yield lists of serialized GeoJSON Features, batch_size rows at a time.
+
+    Rows come off a server-side cursor, so memory is bounded by one batch
+    regardless of how many reports match.
+    """
+    hr = models.HazardReport.__table__
+    stmt = (
+        select(hazard_feature_json(hr).cast(Text))
+        .where(*hazard_report_filters(bbox, **filters))
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.execute(stmt).scalars().partitions()
+
+def aggregate_cell_size(zoom: int, cells_per_tile: int = 8) -> float:
+    """Grid cell edge in degrees so that a map tile at this zoom holds cells_per_tile cells across"""
+    return 360.0 / (2 ** zoom) / cells_per_tile
+
+def get_hazard_aggregates(db: Session, zoom: int, bbox: list[float] | None = None, cells_per_tile: int = 8, **filters) -> str:
+    """
+    Per grid cell counts, max severity and hazard-type breakdown as a
+    serialized FeatureCollection of cell centroids. The grid is computed in
+    PostGIS with ST_SnapToGrid, so the payload scales with visible cells.
+    """
+    hr = models.HazardReport
+    size = aggregate_cell_size(zoom, cells_per_tile)
+    cell = func.ST_SnapToGrid(hr.geom, size)
+    per_type = (
+        select(
+            cell.label("cell"),
+            hr.hazard_type,
+            func.count().label("n"),
+            func.max(hr.severity).label("max_severity"),
+            func.sum(hr.longitude).label("sum_lon"),
+            func.sum(hr.latitude).label("sum_lat"),
+        )
+        .where(*hazard_report_filters(bbox, **filters))
+        .group_by(cell, hr.hazard_type)
+        .subquery()
+    )
+    total = func.sum(per_type.c.n)
+    cells = (
+        select(
+            total.label("count"),
+            func.max(per_type.c.max_severity).label("max_severity"),
+            func.json_object_agg(per_type.c.hazard_type, per_type.c.n).label("hazard_types"),
+            (func.sum(per_type.c.sum_lon) / total).label("lon"),
+            (func.sum(per_type.c.sum_lat) / total).label("lat"),
+        )
+        .group_by(per_type.c.cell)
+        .subquery()
+    )
+    feature = _json_object(
+        type=literal_column("'Feature'"),
+        geometry=_json_object(
+            type=literal_column("'Point'"),
+            coordinates=func.json_build_array(cells.c.lon, cells.c.lat),
+        ),
+        properties=_json_object(
+            count=cells.c["count"],
+            max_severity=cells.c.max_severity,
+            hazard_types=cells.c.hazard_types,
+        ),
+    )
+    features = func.coalesce(func.json_agg(feature), literal_column("'[]'::json")).cast(Text)
+    features_json = db.execute(select(features).select_from(cells)).scalar_one()
+    return '{"type": "FeatureCollection", "cell_size": %s, "features": %s}' % (json.dumps(size), features_json)
+
+def get_hazard_tile(db: Session, z: int, x: int, y: int, **filters) -> bytes:
+    """Encode the hazards inside one XYZ tile as a Mapbox Vector Tile layer named "hazards"."""
+    hr = models.HazardReport.__table__
+    bounds = func.ST_TileEnvelope(z, x, y)
+    q = select(
+        func.ST_AsMVTGeom(func.ST_Transform(hr.c.geom, 3857), bounds).label("geom"),
+        hr.c.hazard_type,
+        hr.c.severity,
+    ).where(hr.c.geom.op("&&")(func.ST_Transform(bounds, 4326)), *hazard_report_filters(**filters))
+    rows = q.subquery("hazards")
+    tile = db.execute(select(func.ST_AsMVT(rows.table_valued(), literal_column("'hazards'")))).scalar_one()
+    return bytes(tile) if tile is not None else b""
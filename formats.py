@@ -0,0 +1,84 @@
+# formats.py
+import io
+import json
+from functools import lru_cache
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# pyarrow and numpy are imported when an Arrow response is first requested,
+# so API workers that never serve one do not pay for them at boot
+@lru_cache(maxsize=None)
+def hazard_schema():
+    import pyarrow as pa
+
+    # Point coordinates as interleaved [lon, lat] doubles, tagged so GeoArrow
+    # aware readers (GeoPandas, DuckDB, lonboard) pick them up as geometry
+    geometry_field = pa.field(
+        "geometry",
+        pa.list_(pa.field("xy", pa.float64(), nullable=False), 2),
+        nullable=False,
+        metadata={
+            "ARROW:extension:name": "geoarrow.point",
+            "ARROW:extension:metadata": json.dumps({"crs": "OGC:CRS84"}),
+        },
+    )
+    return pa.schema([
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("hazard_type", pa.dictionary(pa.int32(), pa.string()), nullable=False),
+        pa.field("severity", pa.int32()),
+        pa.field("description", pa.string()),
+        pa.field("report_time", pa.timestamp("us", tz="UTC")),
+        geometry_field,
+        pa.field("corroboration_count", pa.int32()),
+    ])
+
+def hazard_record_batch(rows):
+    """Columnar pyarrow.RecordBatch from rows shaped like crud.hazard_row_columns()"""
+    import numpy as np
+    import pyarrow as pa
+
+    if not rows:
+        return pa.RecordBatch.from_pylist([], schema=hazard_schema())
+    ids, hazard_types, severities, descriptions, report_times, lons, lats, corroborations = zip(*rows)
+    coords = np.column_stack((np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))).ravel()
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array([str(i) for i in ids], pa.string()),
+            pa.array(hazard_types, pa.string()).dictionary_encode(),
+            pa.array(severities, pa.int32()),
+            pa.array(descriptions, pa.string()),
+            pa.array(report_times, pa.timestamp("us", tz="UTC")),
+            pa.FixedSizeListArray.from_arrays(pa.array(coords, pa.float64()), 2),
+            pa.array(corroborations, pa.int32()),
+        ],
+        schema=hazard_schema(),
+    )
+
+def hazards_to_arrow(rows, metadata: dict | None = None) -> bytes:
+    """Serialize one page of rows as an Arrow IPC stream"""
+    import pyarrow as pa
+
+    schema = hazard_schema().with_metadata({k: str(v) for k, v in (metadata or {}).items() if v is not None})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(hazard_record_batch(rows))
+    return sink.getvalue().to_pybytes()
+
+def iter_arrow_stream(row_batches):
+    """Arrow IPC stream written batch by batch, for StreamingResponse"""
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pa.ipc.new_stream(sink, hazard_schema()) as writer:
+        yield drain()
+        for rows in row_batches:
+            writer.write_batch(hazard_record_batch(rows))
+            yield drain()
+    yield drain()
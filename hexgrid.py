@@ -0,0 +1,63 @@
+# hexgrid.py
+"""
+Pointy-top hexagons on Web Mercator, addressed by axial (q, r) per
+resolution. Each resolution halves the hexagon size of the one before,
+like an H3 pyramid (cells of neighbouring resolutions do not nest exactly).
+Sizes are in Mercator metres, true at the equator and 1/cos(latitude)
+larger on the ground elsewhere.
+"""
+import math
+import os
+
+EARTH_RADIUS_M = 6378137.0
+MAX_LAT = 85.0511
+SQRT3 = math.sqrt(3.0)
+
+# Hexagon circumradius at resolution 0; resolution n is HEX_BASE_SIZE_M / 2**n
+BASE_SIZE_M = float(os.getenv("HEX_BASE_SIZE_M", "400000"))
+RESOLUTIONS = tuple(sorted(int(r) for r in os.getenv("HEX_RESOLUTIONS", "2,3,4,5,6,7,8").split(",")))
+
+def hex_size(resolution: int) -> float:
+    return BASE_SIZE_M / 2 ** resolution
+
+def cells(longitudes, latitudes, resolution: int):
+    """Axial (q, r) int64 arrays of the hexagons containing these points"""
+    import numpy as np
+
+    lat = np.clip(np.asarray(latitudes, dtype=np.float64), -MAX_LAT, MAX_LAT)
+    x = EARTH_RADIUS_M * np.radians(np.asarray(longitudes, dtype=np.float64))
+    y = EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    size = hex_size(resolution)
+    fq = (SQRT3 / 3 * x - y / 3) / size
+    fr = (2 / 3 * y) / size
+    # Cube rounding: round all three coordinates, then fix the one that moved most
+    fs = -fq - fr
+    q, r, s = np.round(fq), np.round(fr), np.round(fs)
+    dq, dr, ds = np.abs(q - fq), np.abs(r - fr), np.abs(s - fs)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+def _to_lonlat(x: float, y: float):
+    return math.degrees(x / EARTH_RADIUS_M), math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS_M)) - math.pi / 2)
+
+def _center_xy(q: int, r: int, resolution: int):
+    size = hex_size(resolution)
+    return size * SQRT3 * (q + r / 2), size * 1.5 * r
+
+def center(q: int, r: int, resolution: int):
+    """(lon, lat) of a hexagon's centre"""
+    return _to_lonlat(*_center_xy(q, r, resolution))
+
+def boundary(q: int, r: int, resolution: int):
+    """Closed GeoJSON ring of [lon, lat] corners"""
+    cx, cy = _center_xy(q, r, resolution)
+    size = hex_size(resolution)
+    ring = []
+    for i in range(6):
+        angle = math.radians(60 * i - 30)
+        ring.append(list(_to_lonlat(cx + size * math.cos(angle), cy + size * math.sin(angle))))
+    ring.append(ring[0])
+    return ring
@@ -0,0 +1,158 @@
+# ingest_buffer.py
+"""
+Buffered write path for hazard submissions.
+
+In buffered mode POST /hazards/ validates the report, assigns its id and
+report_time, appends it to a Redis stream and answers 202. The flusher
+(tasks.ingest) drains the stream into hazard_reports in batches through a
+consumer group. Entries are acknowledged only after the rows are committed,
+so a crashed flusher, or one that loses the database, leaves them pending
+to be claimed again after INGEST_CLAIM_IDLE_MS, and the insert skips ids
+that are already stored. Only rows the database rejects are dead-lettered.
+Like direct submissions, a report duplicating a recent one nearby, stored or
+earlier in the same batch, is merged into it (crud.bulk_create_hazard_reports);
+its status then becomes "merged".
+Redis must run with AOF (appendfsync always, see docker-compose.yaml) for
+acknowledged submissions to survive a Redis restart.
+"""
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+
+import redis
+from dotenv import load_dotenv
+from sqlalchemy import exc
+
+import schemas
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# direct: commit inside the request (default), buffered: stream + flusher
+HAZARD_INGEST_MODE = os.getenv("HAZARD_INGEST_MODE", "direct")
+INGEST_REDIS_URL = os.getenv("INGEST_REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+# Pending entries idle this long belong to a dead flusher and get reclaimed
+INGEST_CLAIM_IDLE_MS = int(os.getenv("INGEST_CLAIM_IDLE_MS", "60000"))
+STATUS_TTL_SECONDS = 7 * 24 * 3600
+
+STREAM = "hazards:ingest"
+DEAD_LETTER_STREAM = "hazards:ingest:dead"
+GROUP = "hazard-flushers"
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(INGEST_REDIS_URL, decode_responses=True)
+    return _client
+
+def _status_key(report_id):
+    return f"hazards:ingest:status:{report_id}"
+
+def _status_value(status: str, report_time: str) -> str:
+    # The report_time rides along so lookups by id can go straight to its partition
+    return f"{status}|{report_time}"
+
+def buffered_mode() -> bool:
+    return HAZARD_INGEST_MODE == "buffered"
+
+def enqueue_report(hazard: schemas.HazardReportCreate):
+    """Durably queue a validated report; returns its id and report_time"""
+    report_id = uuid.uuid4()
+    report_time = datetime.now(timezone.utc)
+    client = get_client()
+    pipe = client.pipeline(transaction=True)
+    pipe.xadd(STREAM, {"id": str(report_id), "report_time": report_time.isoformat(), "report": hazard.model_dump_json()})
+    pipe.set(_status_key(report_id), _status_value("queued", report_time.isoformat()), ex=STATUS_TTL_SECONDS)
+    pipe.execute()
+    return report_id, report_time
+
+def get_status(report_id: uuid.UUID):
+    """(status, report_time) of a buffered submission, or None once its key has expired"""
+    value = get_client().get(_status_key(report_id))
+    if value is None:
+        return None
+    status, _, report_time = value.partition("|")
+    return status, datetime.fromisoformat(report_time) if report_time else None
+
+def _ensure_group(client):
+    try:
+        client.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def _read_batch(client, consumer, count, block_ms):
+    # Entries a dead flusher left unacknowledged come first
+    _, claimed, _ = client.xautoclaim(STREAM, GROUP, consumer, min_idle_time=INGEST_CLAIM_IDLE_MS, start_id="0-0", count=count)
+    if claimed:
+        return claimed
+    response = client.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=count, block=block_ms)
+    return response[0][1] if response else []
+
+def _decode(fields):
+    return (
+        uuid.UUID(fields["id"]),
+        datetime.fromisoformat(fields["report_time"]),
+        schemas.HazardReportCreate.model_validate_json(fields["report"]),
+    )
+
+def rejects_data(error: exc.StatementError) -> bool:
+    """
+    Whether the statement failed on the rows themselves (constraint,
+    invalid value, parameter that cannot be bound) rather than on the
+    connection or the server, which a later attempt can get past
+    """
+    return isinstance(error, (exc.IntegrityError, exc.DataError)) or not isinstance(error, exc.DBAPIError)
+
+def flush(db, consumer: str | None = None, batch_size: int = INGEST_BATCH_SIZE, block_ms: int | None = None) -> int:
+    """Move one batch from the stream into hazard_reports; returns how many entries were handled"""
+    import crud
+
+    client = get_client()
+    consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+    _ensure_group(client)
+    entries = [(entry_id, fields) for entry_id, fields in _read_batch(client, consumer, batch_size, block_ms) if fields]
+    if not entries:
+        return 0
+
+    decoded = [_decode(fields) for _, fields in entries]
+    ids, report_times, hazards = (list(column) for column in zip(*decoded))
+    failed, merged = set(), set()
+    try:
+        _, merged = crud.bulk_create_hazard_reports(db, hazards, ids=ids, report_times=report_times, dedup=True)
+    except exc.StatementError as e:
+        db.rollback()
+        if not rejects_data(e):
+            # Outage or failover: leave the batch pending for the next flusher to claim
+            raise
+        # Isolate the rows the database rejects so one bad entry cannot stall the stream
+        logger.warning("batch insert of %d buffered reports failed (%s); retrying row by row", len(entries), e)
+        for index, row in enumerate(decoded):
+            try:
+                _, row_merged = crud.bulk_create_hazard_reports(db, [row[2]], ids=[row[0]], report_times=[row[1]], dedup=True)
+                if row_merged:
+                    merged.add(index)
+            except exc.StatementError as row_error:
+                db.rollback()
+                if not rejects_data(row_error):
+                    raise
+                logger.exception("buffered report %s rejected by the database", row[0])
+                failed.add(index)
+
+    pipe = client.pipeline(transaction=True)
+    for index, (entry_id, fields) in enumerate(entries):
+        if index in failed:
+            pipe.xadd(DEAD_LETTER_STREAM, fields)
+        status = "failed" if index in failed else "merged" if index in merged else "stored"
+        pipe.set(_status_key(fields["id"]), _status_value(status, fields["report_time"]), ex=STATUS_TTL_SECONDS)
+    entry_ids = [entry_id for entry_id, _ in entries]
+    pipe.xack(STREAM, GROUP, *entry_ids)
+    pipe.xdel(STREAM, *entry_ids)
+    pipe.execute()
+    return len(entries)
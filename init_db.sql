@@ -1 +0,0 @@
-CREATE EXTENSION IF NOT EXISTS postgis;
@@ -1,17 +1,26 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from datetime import datetime, timedelta, timezone
+import hashlib
 import json
+import os
+import uuid
 
-import models, schemas, crud, database
-from database import get_db
+# Schema changes are applied by `python migrate.py`, not at import
+import schemas, crud, database, formats, hexgrid, tiles, ingest_buffer
+from database import get_async_db, get_read_db, pool_stats
+from cache import hazard_cache, snap_bbox
 from auth import routes as auth_routes
+from auth.routes import get_current_active_user
+import uploads
 
-# Create tables (simple approach for MVP)
-database.Base.metadata.create_all(bind=database.engine)
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "10000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(20 * 1024 * 1024)))
 
 app = FastAPI(title="Ocean Hazard API")
 
@@ -32,61 +41,425 @@ def root():
     return {"message": "Ocean Hazard API is running!"}
 
 @app.post("/hazards/", response_model=schemas.HazardReport)
-def create_hazard(hazard: schemas.HazardReportCreate, db: Session = Depends(get_db)):
-    return crud.create_hazard_report(db, hazard)
+async def create_hazard(hazard: schemas.HazardReportCreate, db: AsyncSession = Depends(get_async_db)):
+    if ingest_buffer.buffered_mode():
+        report_id, report_time = await run_in_threadpool(ingest_buffer.enqueue_report, hazard)
+        return JSONResponse(
+            status_code=202,
+            content={"id": str(report_id), "status": "queued", "report_time": report_time.isoformat()},
+            headers={"Location": f"/hazards/submissions/{report_id}"},
+        )
+    # crud stays sync; run_sync drives it on the async connection
+    return await db.run_sync(crud.create_hazard_report, hazard)
+
+@app.get("/hazards/submissions/{report_id}")
+async def get_submission_status(
+    report_id: uuid.UUID,
+    report_time: datetime | None = Query(None, description="report_time from the 202 response; narrows the lookup"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Where a buffered submission is: queued, stored, merged into an existing report or failed"""
+    buffered = await run_in_threadpool(ingest_buffer.get_status, report_id)
+    if buffered is not None:
+        status, report_time = buffered[0], buffered[1] or report_time
+    # Status keys expire; the tables are the record of anything older
+    elif await db.run_sync(crud.hazard_report_exists, report_id, report_time):
+        status = "stored"
+    elif await db.run_sync(crud.get_merged_report_id, report_id):
+        status = "merged"
+    else:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    body = {"id": str(report_id), "status": status}
+    if report_time is not None:
+        body["report_time"] = report_time.isoformat()
+    return body
+
+@app.post("/hazards/{report_id}/media", response_model=schemas.MediaResponse, status_code=201)
+async def upload_hazard_media(
+    report_id: uuid.UUID,
+    request: Request,
+    filename: str = Query(..., max_length=255, description="original file name"),
+    report_time: datetime | None = Query(None, description="the report's report_time; narrows the lookup"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_active_user),
+):
+    """
+    Attach an image, video or audio file to a report. The raw file is the
+    request body, with its Content-Type; it is streamed to disk in chunks and
+    a thumbnail is generated in the background.
+    """
+    content_type = request.headers.get("content-type", "")
+    kind = uploads.media_kind(content_type)
+    if kind is None:
+        raise HTTPException(status_code=415, detail="Content-Type must be image/*, video/* or audio/*")
+    max_bytes = uploads.MAX_BYTES[kind]
+    if request_content_length(request) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"{kind} uploads are limited to {max_bytes} bytes")
+    if not await db.run_sync(crud.hazard_report_exists, report_id, report_time):
+        raise HTTPException(status_code=404, detail="Hazard report not found")
+    # The body can take minutes to arrive; end the transaction and give the
+    # connection back to the pool instead of holding it for the whole stream
+    user_id = current_user.id
+    await db.close()
+    if uploads.upload_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many uploads in progress", headers={"Retry-After": "5"})
+
+    media_id = uuid.uuid4()
+    dest = uploads.media_path(content_type, media_id)
+    async with uploads.upload_slots:
+        try:
+            size = await uploads.save_stream(request.stream(), dest, max_bytes)
+        except uploads.UploadTooLarge:
+            raise HTTPException(status_code=413, detail=f"{kind} uploads are limited to {max_bytes} bytes")
+    try:
+        async with database.AsyncSessionLocal() as media_db:
+            media = await media_db.run_sync(
+                crud.create_media,
+                id=media_id,
+                user_id=user_id,
+                hazard_report_id=report_id,
+                filename=os.path.basename(filename),
+                file_path=str(dest),
+                file_type=kind,
+                file_size=size,
+            )
+    except Exception:
+        dest.unlink(missing_ok=True)
+        raise
+
+    if kind != "audio":
+        from tasks.media import generate_media_preview
+        await run_in_threadpool(generate_media_preview.delay, str(media_id))
+    return media
+
+def request_content_length(request: Request) -> int:
+    """Declared body size, 0 when absent; a malformed header is the client's error"""
+    try:
+        return int(request.headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Content-Length must be an integer")
+
+def parse_bbox(bbox: str | None):
+    if not bbox:
+        return None
+    try:
+        bbox_list = list(map(float, bbox.split(",")))
+        if len(bbox_list) != 4:
+            raise ValueError()
+    except Exception:
+        raise HTTPException(status_code=400, detail="bbox must be 4 comma-separated floats: minLon,minLat,maxLon,maxLat")
+    return bbox_list
+
+async def hazard_version(db: AsyncSession, read_db: AsyncSession, tile: tuple[int, int, int] | None = None) -> int | None:
+    # Global hazard change sequence, or with tile the sequence value of the last
+    # write inside that tile; ETags and cache keys both carry it.
+    # Read it before the body so a cached body is never older than its key.
+    # Always read on the primary: a replica reports sequence values ahead of use.
+    if read_db.bind is not database.async_read_engine:
+        return await db.run_sync(crud.get_hazard_change_seq, tile)
+    # The body comes from the replica: the version only holds for it once the
+    # replica has replayed the WAL written up to that sequence value. A lagging
+    # replica is served without ETag or cache rather than pinning old rows.
+    version, lsn = await db.run_sync(crud.get_hazard_change_position, tile)
+    if not await read_db.run_sync(crud.replica_has_replayed, lsn):
+        return None
+    return version
+
+def hazard_etag(version: int, namespace: str, **params) -> str:
+    # Cheap validator: data version plus the request parameters
+    digest = hashlib.sha1(json.dumps([namespace, params], sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+def not_modified(etag: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def snapped_bbox(bbox: str | None):
+    # Cached reads query the snapped bbox so every viewport sharing a key gets the same rows
+    bbox_list = parse_bbox(bbox)
+    return snap_bbox(bbox_list) if bbox_list else None
+
+def hazard_filter_params(
+    since: datetime | None = Query(None, description="reports at or after this time (ISO 8601)"),
+    until: datetime | None = Query(None, description="reports before this time (ISO 8601)"),
+    hazard_type: list[str] | None = Query(None, description="repeat to match several types"),
+    min_severity: int | None = Query(None),
+):
+    """Query filters shared by the hazard read endpoints, in crud.hazard_report_filters form"""
+    return {
+        "since": since,
+        "until": until,
+        "hazard_types": sorted(set(hazard_type)) if hazard_type else None,
+        "min_severity": min_severity,
+    }
+
+def negotiate_format(request: Request, format: str | None, default: str) -> str:
+    # An explicit ?format= wins over the Accept header
+    if format:
+        return format
+    if formats.ARROW_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "arrow"
+    return default
+
+@app.post("/hazards/bulk")
+async def create_hazards_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_active_user),
+):
+    """
+    Ingest a JSON array or NDJSON body of hazard reports in one transaction.
+    Invalid rows are reported individually; the valid ones are still stored.
+    Duplicates of stored reports, or of an earlier report in the same body,
+    are merged into them, as in POST /hazards/.
+    """
+    if request_content_length(request) > BULK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"bulk body is limited to {BULK_MAX_BYTES} bytes")
+    # The auth lookup opened a transaction; give the connection back while the
+    # body arrives and is validated. The session checks out a new one to insert.
+    user_id = current_user.id
+    await db.close()
+    body = await request.body()
+    if len(body) > BULK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"bulk body is limited to {BULK_MAX_BYTES} bytes")
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    total, valid, results, valid_results = await run_in_threadpool(validate_bulk, body, ndjson)
+    ids, merged = await db.run_sync(crud.bulk_create_hazard_reports, valid, dedup=True, user_id=user_id)
+    for index, (result, hazard_id) in enumerate(zip(valid_results, ids)):
+        result["id"] = str(hazard_id)
+        if index in merged:
+            result["status"] = "merged"
+    return {"created": len(valid) - len(merged), "merged": len(merged), "invalid": total - len(valid), "results": results}
+
+def validate_bulk(body: bytes, ndjson: bool):
+    """Parse and validate a bulk body; returns (item count, valid reports, per-row results, results of the valid rows)"""
+    try:
+        if ndjson:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"body is not valid JSON: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="body must be a JSON array or NDJSON")
+    if len(items) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"at most {BULK_MAX_ROWS} reports per request")
+
+    results = []
+    valid, valid_results = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(schemas.HazardReportCreate.model_validate(item))
+        except ValidationError as e:
+            results.append({"index": index, "status": "invalid", "errors": e.errors(include_url=False, include_context=False)})
+            continue
+        result = {"index": index, "status": "created"}
+        results.append(result)
+        valid_results.append(result)
+    return len(items), valid, results, valid_results
 
 @app.get("/hazards/geojson")
-def read_hazards_geojson(
+async def read_hazards_geojson(
+    request: Request,
     bbox: str | None = Query(None, description="bbox=minLon,minLat,maxLon,maxLat"),
     limit: int = Query(100),
     skip: int = Query(0),
-    db: Session = Depends(get_db)
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    format: str | None = Query(None, pattern="^(geojson|arrow)$", description="or Accept: application/vnd.apache.arrow.stream"),
+    filters: dict = Depends(hazard_filter_params),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_read_db)
 ):
-    if bbox:
+    fmt = negotiate_format(request, format, "geojson")
+    params = dict(bbox=snapped_bbox(bbox), limit=limit, skip=skip, cursor=cursor, **filters)
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept"}
+    version = await hazard_version(db, read_db)
+    if version is not None:
+        headers["ETag"] = etag = hazard_etag(version, "geojson", format=fmt, **params)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    key = hazard_cache.make_key("geojson", version, format=fmt, **params)
+    body = await hazard_cache.get_async(key)
+    if body is None:
         try:
-            bbox_list = list(map(float, bbox.split(",")))
-            if len(bbox_list) != 4:
-                raise ValueError()
-        except Exception:
-            raise HTTPException(status_code=400, detail="bbox must be 4 comma-separated floats: minLon,minLat,maxLon,maxLat")
-    else:
-        bbox_list = None
-
-    hazards = crud.get_hazard_reports(db, bbox=bbox_list, limit=limit, skip=skip)
-    features = []
-    for h in hazards:
-        # Use DB-side ST_AsGeoJSON for exact geometry representation
-        stmt = select(func.ST_AsGeoJSON(models.HazardReport.geom)).where(models.HazardReport.id == h.id)
-        geojson_str = db.execute(stmt).scalar_one()
-        geometry = json.loads(geojson_str)
-        features.append({
-            "type": "Feature",
-            "geometry": geometry,
-            "properties": {
-                "id": str(h.id),
-                "hazard_type": h.hazard_type,
-                "severity": h.severity,
-                "description": h.description,
-                "report_time": h.report_time.isoformat() if h.report_time else None
-            }
-        })
-    return JSONResponse({
-        "type": "FeatureCollection",
-        "features": features
-    })
+            if fmt == "arrow":
+                # next_cursor travels in the Arrow schema metadata
+                rows, next_cursor = await read_db.run_sync(crud.get_hazard_rows, **params)
+                body = formats.hazards_to_arrow(rows, {"next_cursor": next_cursor})
+            else:
+                # The FeatureCollection is serialized by PostGIS; pass it through untouched
+                body = await read_db.run_sync(crud.get_hazard_geojson, **params)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cursor is not a valid next_cursor value")
+        await hazard_cache.set_async(key, body)
+    media_type = formats.ARROW_MEDIA_TYPE if fmt == "arrow" else "application/json"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@app.get("/hazards/export")
+def export_hazards(
+    request: Request,
+    bbox: str | None = Query(None, description="bbox=minLon,minLat,maxLon,maxLat"),
+    format: str | None = Query(None, pattern="^(ndjson|geojson|arrow)$", description="defaults to ndjson, or arrow via the Accept header"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+    filters: dict = Depends(hazard_filter_params),
+):
+    """
+    Stream every matching hazard as newline-delimited GeoJSON, as one
+    FeatureCollection written feature by feature, or as an Arrow IPC stream
+    with one record batch per database batch
+    """
+    fmt = negotiate_format(request, format, "ndjson")
+    bbox_list = parse_bbox(bbox)
+
+    def generate():
+        # The response outlives the request dependencies, so the stream owns its session
+        db = database.SessionLocal()
+        try:
+            if fmt == "arrow":
+                yield from formats.iter_arrow_stream(crud.iter_hazard_rows(db, bbox=bbox_list, batch_size=batch_size, **filters))
+                return
+            first = True
+            if fmt == "geojson":
+                yield '{"type": "FeatureCollection", "features": ['
+            for batch in crud.iter_hazard_features(db, bbox=bbox_list, batch_size=batch_size, **filters):
+                if fmt == "ndjson":
+                    yield "\n".join(batch) + "\n"
+                else:
+                    yield ("" if first else ",") + ",".join(batch)
+                first = False
+            if fmt == "geojson":
+                yield "]}"
+        finally:
+            db.close()
+
+    media_types = {"ndjson": "application/x-ndjson", "geojson": "application/geo+json", "arrow": formats.ARROW_MEDIA_TYPE}
+    return StreamingResponse(generate(), media_type=media_types[fmt])
+
+@app.get("/hazards/aggregate")
+async def read_hazard_aggregates(
+    request: Request,
+    zoom: int = Query(..., ge=0, le=22),
+    bbox: str | None = Query(None, description="bbox=minLon,minLat,maxLon,maxLat"),
+    cells_per_tile: int = Query(8, ge=1, le=64),
+    filters: dict = Depends(hazard_filter_params),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Grid-cell summaries (count, max severity, hazard types) for low zoom levels
+    """
+    params = dict(bbox=snapped_bbox(bbox), cells_per_tile=cells_per_tile, **filters)
+    headers = {"Cache-Control": "no-cache"}
+    version = await hazard_version(db, read_db)
+    if version is not None:
+        headers["ETag"] = etag = hazard_etag(version, "aggregate", zoom=zoom, **params)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    key = hazard_cache.make_key("aggregate", version, zoom=zoom, **params)
+    geojson = await hazard_cache.get_async(key)
+    if geojson is None:
+        geojson = await read_db.run_sync(crud.get_hazard_aggregates, zoom, **params)
+        await hazard_cache.set_async(key, geojson)
+    return Response(content=geojson, media_type="application/json", headers=headers)
+
+@app.get("/hazards/tiles/{z}/{x}/{y}.mvt")
+async def read_hazard_tile(
+    request: Request,
+    z: int,
+    x: int,
+    y: int,
+    filters: dict = Depends(hazard_filter_params),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Hazards as a Mapbox Vector Tile with hazard_type and severity attributes
+    """
+    if not tiles.is_valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="tile coordinates out of range")
+
+    headers = {"Cache-Control": "no-cache"}
+    # Writes elsewhere leave this tile's version, its ETag and cached copy alone
+    version = await hazard_version(db, read_db, tiles.versioned_tile(z, x, y))
+    key = (version, z, x, y, json.dumps(filters, sort_keys=True, default=str))
+    tile = None
+    if version is not None:
+        headers["ETag"] = etag = hazard_etag(version, "tile", key=key[1:])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        tile = tiles.tile_cache.get(key)
+    if tile is None:
+        tile = await read_db.run_sync(crud.get_hazard_tile, z, x, y, **filters)
+        if version is not None:
+            tiles.tile_cache.set(key, tile)
+    return Response(content=tile, media_type="application/vnd.mapbox-vector-tile", headers=headers)
+
+@app.get("/metrics/db-pools")
+def read_db_pool_metrics():
+    """Connection pool occupancy and checkout waits of this worker process"""
+    return pool_stats()
+
+@app.get("/hotspots")
+async def read_hotspots(
+    limit: int = Query(100, ge=1, le=1000),
+    min_points: int = Query(1, ge=1),
+    read_db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Current hotspots, kept up to date every few seconds by the refresh_hotspots beat task
+    """
+    return await read_db.run_sync(crud.get_hotspots, limit, min_points)
+
+@app.get("/hotspots/hex")
+async def read_hex_hotspots(
+    resolution: int = Query(5, description="hexgrid resolution; each step halves the hexagon size"),
+    since: datetime | None = Query(None, description="window start (ISO 8601), default 24 hours ago"),
+    until: datetime | None = Query(None, description="window end (ISO 8601), default now"),
+    bbox: str | None = Query(None, description="minLon,minLat,maxLon,maxLat"),
+    hazard_type: list[str] | None = Query(None, description="repeat to match several types"),
+    min_reports: int = Query(1, ge=1),
+    read_db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Hexagon hotspots at any precomputed resolution and time window, from the
+    pyramid the refresh_hex_pyramid beat task maintains (windows snap to whole
+    hours, or whole days where they reach past the hourly retention)
+    """
+    if resolution not in hexgrid.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {list(hexgrid.RESOLUTIONS)}")
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=24)
+    # Buckets are cut in UTC; times without an offset are taken as UTC
+    since, until = ((t if t.tzinfo else t.replace(tzinfo=timezone.utc)).astimezone(timezone.utc) for t in (since, until))
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    return await read_db.run_sync(
+        crud.get_hex_hotspots, resolution, since, until, parse_bbox(bbox),
+        sorted(set(hazard_type)) if hazard_type else None, min_reports,
+    )
 
 # DBSCAN Clustering Endpoints
 @app.post("/tasks/dbscan-hotspots")
 async def trigger_dbscan_hotspots(
     time_window: int = 24,
-    eps: float = 0.1,
-    min_samples: int = 3
+    eps_km: float = Query(1.0, gt=0, description="neighbourhood radius in kilometres"),
+    min_samples: int = 3,
+    backend: str = Query("sklearn", pattern="^(sklearn|postgis|kmeans)$"),
+    n_clusters: int = Query(8, ge=1, description="k for the kmeans backend")
 ):
     """
     Trigger DBSCAN clustering for hazard hotspots
     """
     from tasks.ml_clustering import generate_dbscan_hotspots
-    task = generate_dbscan_hotspots.delay(time_window)
+    task = generate_dbscan_hotspots.delay(time_window, eps_km, min_samples, backend, n_clusters)
     return {"task_id": task.id, "status": "started"}
 
 @app.get("/tasks/dbscan-hotspots/{task_id}")
@@ -0,0 +1,67 @@
+# migrate.py
+"""
+Apply the numbered SQL files in migrations/ in order, once each.
+
+    python migrate.py           # apply pending migrations
+    python migrate.py status    # list applied and pending migrations
+"""
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+from database import engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+# Arbitrary key so two containers starting together do not migrate concurrently
+LOCK_KEY = 4171902
+
+def available_migrations():
+    return sorted(MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.sql"))
+
+def applied_versions(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """))
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+def upgrade():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        conn.commit()
+        try:
+            with conn.begin():
+                done = applied_versions(conn)
+            for path in available_migrations():
+                version = path.stem
+                if version in done:
+                    continue
+                print(f"Applying {version}...")
+                # Each file and its bookkeeping row commit together
+                with conn.begin():
+                    # Raw SQL: a literal % (format('%I'), LIKE 'x%') is not a bind marker
+                    conn.execution_options(no_parameters=True).exec_driver_sql(path.read_text())
+                    conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+            print("Database schema is up to date")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            conn.commit()
+
+def status():
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    for path in available_migrations():
+        print(f"{'applied' if path.stem in done else 'pending':8} {path.stem}")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        upgrade()
+    elif command == "status":
+        status()
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,51 @@
+-- Baseline schema: what init_db.sql, Base.metadata.create_all and
+-- migrate_add_user_id.sql produced before migrations were tracked.
+-- Everything is IF NOT EXISTS so databases created the old way adopt it as-is.
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+CREATE TABLE IF NOT EXISTS users (
+    id UUID PRIMARY KEY,
+    email VARCHAR NOT NULL,
+    hashed_password VARCHAR NOT NULL,
+    full_name VARCHAR NOT NULL,
+    is_active BOOLEAN,
+    is_verified BOOLEAN,
+    role VARCHAR,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email);
+
+CREATE TABLE IF NOT EXISTS user_sessions (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users(id),
+    token VARCHAR NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_user_sessions_token ON user_sessions (token);
+
+CREATE TABLE IF NOT EXISTS hazard_reports (
+    id UUID PRIMARY KEY,
+    hazard_type VARCHAR NOT NULL,
+    geom geometry(POINT, 4326) NOT NULL,
+    severity INTEGER,
+    description VARCHAR,
+    report_time TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+ALTER TABLE hazard_reports ADD COLUMN IF NOT EXISTS user_id UUID REFERENCES users(id);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_hazard_type ON hazard_reports (hazard_type);
+
+CREATE TABLE IF NOT EXISTS media (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id),
+    hazard_report_id UUID REFERENCES hazard_reports(id),
+    filename VARCHAR NOT NULL,
+    file_path VARCHAR NOT NULL,
+    file_type VARCHAR NOT NULL,
+    file_size INTEGER NOT NULL,
+    uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_media_user_id ON media (user_id);
+CREATE INDEX IF NOT EXISTS idx_media_hazard_report_id ON media (hazard_report_id);
@@ -0,0 +1,5 @@
+-- Keyset pagination index for /hazards/geojson?cursor= and the global
+-- change counter behind the read endpoints' ETags
+
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_report_time_id ON hazard_reports (report_time, id);
+CREATE SEQUENCE IF NOT EXISTS hazard_change_seq;
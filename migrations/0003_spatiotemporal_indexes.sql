@@ -0,0 +1,12 @@
+-- Spatio-temporal index set for hazard_reports.
+-- * GiST on geom for bbox / tile / distance filters (same name geoalchemy2
+--   used for its implicit index, so existing databases keep theirs)
+-- * report_time range filters of the hotspot tasks use the leading column
+--   of ix_hazard_reports_report_time_id from 0002
+-- * (user_id, report_time) for per-user history; it makes the single
+--   column user_id index redundant
+
+CREATE INDEX IF NOT EXISTS idx_hazard_reports_geom ON hazard_reports USING gist (geom);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_user_id_report_time ON hazard_reports (user_id, report_time);
+DROP INDEX IF EXISTS idx_hazard_reports_user_id;
+ANALYZE hazard_reports;
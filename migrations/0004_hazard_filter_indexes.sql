@@ -0,0 +1,9 @@
+-- Indexes behind the since / until / hazard_type / min_severity read filters.
+-- (hazard_type, report_time) serves type filters within a window and
+-- supersedes the single column hazard_type index; the partial index keeps
+-- the "last N hours, severity >= 4" view down to the rows it returns.
+
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_hazard_type_report_time ON hazard_reports (hazard_type, report_time);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_severe_report_time ON hazard_reports (report_time) WHERE severity >= 4;
+DROP INDEX IF EXISTS ix_hazard_reports_hazard_type;
+ANALYZE hazard_reports;
@@ -0,0 +1,6 @@
+-- Ingest-time dedup: duplicate citizen reports are merged into the nearest
+-- recent report of the same type instead of being stored again. The lookup
+-- runs on idx_hazard_reports_geom and ix_hazard_reports_hazard_type_report_time.
+
+ALTER TABLE hazard_reports ADD COLUMN IF NOT EXISTS corroboration_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE hazard_reports ADD COLUMN IF NOT EXISTS last_corroborated_at TIMESTAMPTZ;
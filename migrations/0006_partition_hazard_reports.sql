@@ -0,0 +1,68 @@
+-- Range-partition hazard_reports by report_time so recent-window queries
+-- prune to the newest partitions and old history can be detached instead
+-- of deleted row by row. Existing rows are copied into monthly partitions;
+-- from here on tasks/partitions.py creates partitions ahead of time (daily
+-- or monthly) and applies retention. Rows without a report_time, and any
+-- that arrive before their partition exists, land in hazard_reports_default.
+--
+-- The primary key must contain the partition key, so it becomes
+-- (id, report_time) and media.hazard_report_id loses its foreign key.
+-- The copy rewrites the whole table; run it in a maintenance window.
+
+DO $$
+DECLARE
+    month_start timestamp;
+    last_month timestamp;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'hazard_reports'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE media DROP CONSTRAINT IF EXISTS media_hazard_report_id_fkey;
+    ALTER TABLE hazard_reports RENAME TO hazard_reports_unpartitioned;
+
+    CREATE TABLE hazard_reports (
+        id UUID NOT NULL,
+        user_id UUID REFERENCES users(id),
+        hazard_type VARCHAR NOT NULL,
+        geom geometry(POINT, 4326) NOT NULL,
+        severity INTEGER,
+        description VARCHAR,
+        report_time TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        corroboration_count INTEGER NOT NULL DEFAULT 1,
+        last_corroborated_at TIMESTAMP WITH TIME ZONE,
+        PRIMARY KEY (id, report_time)
+    ) PARTITION BY RANGE (report_time);
+
+    CREATE TABLE hazard_reports_default PARTITION OF hazard_reports DEFAULT;
+
+    -- Month boundaries are taken in UTC, matching tasks/partitions.py
+    SELECT date_trunc('month', coalesce(min(report_time), now()) AT TIME ZONE 'UTC')
+      INTO month_start FROM hazard_reports_unpartitioned;
+    last_month := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months';
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF hazard_reports FOR VALUES FROM (%L) TO (%L)',
+            'hazard_reports_p' || to_char(month_start, 'YYYYMM'),
+            month_start AT TIME ZONE 'UTC',
+            (month_start + interval '1 month') AT TIME ZONE 'UTC'
+        );
+        month_start := month_start + interval '1 month';
+    END LOOP;
+
+    INSERT INTO hazard_reports (id, user_id, hazard_type, geom, severity, description,
+                                report_time, corroboration_count, last_corroborated_at)
+    SELECT id, user_id, hazard_type, geom, severity, description,
+           coalesce(report_time, 'epoch'), corroboration_count, last_corroborated_at
+    FROM hazard_reports_unpartitioned;
+
+    DROP TABLE hazard_reports_unpartitioned;
+END $$;
+
+-- Partitioned indexes: created on every existing partition and on each one attached later
+CREATE INDEX IF NOT EXISTS idx_hazard_reports_geom ON hazard_reports USING gist (geom);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_report_time_id ON hazard_reports (report_time, id);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_user_id_report_time ON hazard_reports (user_id, report_time);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_hazard_type_report_time ON hazard_reports (hazard_type, report_time);
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_severe_report_time ON hazard_reports (report_time) WHERE severity >= 4;
+ANALYZE hazard_reports;
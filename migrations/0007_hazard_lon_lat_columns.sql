@@ -0,0 +1,6 @@
+-- Stored generated longitude/latitude so list endpoints, exports and the
+-- clustering tasks read plain floats instead of decoding geometry. Adding
+-- a stored column rewrites every partition once.
+
+ALTER TABLE hazard_reports ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION GENERATED ALWAYS AS (ST_X(geom)) STORED;
+ALTER TABLE hazard_reports ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION GENERATED ALWAYS AS (ST_Y(geom)) STORED;
@@ -0,0 +1,4 @@
+-- Thumbnail/preview location for uploaded media, filled in by the
+-- tasks.media.generate_media_preview Celery task after upload.
+
+ALTER TABLE media ADD COLUMN IF NOT EXISTS preview_path VARCHAR;
@@ -0,0 +1,44 @@
+-- Persistent hotspot state for tasks/incremental_hotspots.py. Each refresh
+-- folds in reports inserted since the watermark (hazard_reports.created_at)
+-- and expires members older than the window instead of reclustering it.
+
+ALTER TABLE hazard_reports ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS ix_hazard_reports_created_at ON hazard_reports (created_at);
+
+CREATE TABLE IF NOT EXISTS hotspot_clusters (
+    id BIGSERIAL PRIMARY KEY,
+    point_count INTEGER NOT NULL DEFAULT 0,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    average_severity DOUBLE PRECISION,
+    hazard_types VARCHAR[] NOT NULL DEFAULT '{}',
+    first_report_time TIMESTAMPTZ,
+    last_report_time TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_hotspot_clusters_point_count ON hotspot_clusters (point_count);
+
+CREATE TABLE IF NOT EXISTS hotspot_members (
+    report_id UUID PRIMARY KEY,
+    report_time TIMESTAMPTZ NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    geog geography(POINT, 4326) GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED,
+    hazard_type VARCHAR NOT NULL,
+    severity INTEGER,
+    neighbours INTEGER NOT NULL DEFAULT 1,
+    cluster_id BIGINT REFERENCES hotspot_clusters (id) ON DELETE SET NULL
+);
+CREATE INDEX IF NOT EXISTS ix_hotspot_members_geog ON hotspot_members USING gist (geog);
+CREATE INDEX IF NOT EXISTS ix_hotspot_members_report_time ON hotspot_members (report_time);
+CREATE INDEX IF NOT EXISTS ix_hotspot_members_cluster_id ON hotspot_members (cluster_id);
+
+CREATE TABLE IF NOT EXISTS hotspot_state (
+    id INTEGER PRIMARY KEY,
+    eps_km DOUBLE PRECISION NOT NULL,
+    min_samples INTEGER NOT NULL,
+    window_hours DOUBLE PRECISION NOT NULL,
+    watermark TIMESTAMPTZ NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    rebuilt_at TIMESTAMPTZ NOT NULL
+);
@@ -0,0 +1,28 @@
+-- Hexagon pyramid of report counts for GET /hotspots/hex, maintained by
+-- tasks/hex_pyramid.py. The primary key leads with (resolution,
+-- bucket_width, bucket_start) so a time-window query is one index range.
+
+CREATE TABLE IF NOT EXISTS hazard_hex_aggregates (
+    resolution SMALLINT NOT NULL,
+    bucket_width VARCHAR NOT NULL,
+    bucket_start TIMESTAMPTZ NOT NULL,
+    hazard_type VARCHAR NOT NULL,
+    q INTEGER NOT NULL,
+    r INTEGER NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    report_count INTEGER NOT NULL,
+    severity_sum DOUBLE PRECISION NOT NULL,
+    severity_count INTEGER NOT NULL,
+    max_severity INTEGER,
+    PRIMARY KEY (resolution, bucket_width, bucket_start, hazard_type, q, r)
+);
+CREATE INDEX IF NOT EXISTS ix_hazard_hex_aggregates_bucket ON hazard_hex_aggregates (bucket_width, bucket_start);
+
+CREATE TABLE IF NOT EXISTS hex_pyramid_state (
+    id INTEGER PRIMARY KEY,
+    grid VARCHAR NOT NULL,
+    watermark TIMESTAMPTZ NOT NULL,
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    rebuilt_at TIMESTAMPTZ NOT NULL
+);
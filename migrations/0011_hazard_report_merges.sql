@@ -0,0 +1,10 @@
+-- Buffered submissions merged into an existing report when the ingest
+-- flusher stored them. A stream entry replayed after a flusher crash finds
+-- its record here and is not merged a second time.
+
+CREATE TABLE IF NOT EXISTS hazard_report_merges (
+    submission_id UUID PRIMARY KEY,
+    report_id UUID NOT NULL,
+    merged_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS ix_hazard_report_merges_merged_at ON hazard_report_merges (merged_at);
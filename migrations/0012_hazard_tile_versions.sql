@@ -0,0 +1,11 @@
+-- Change sequence value of the last hazard write inside each XYZ tile, so
+-- tile ETags and cached tiles are retired per tile instead of on every write.
+-- Tiles without a row have not been written to since this migration.
+
+CREATE TABLE IF NOT EXISTS hazard_tile_versions (
+    z SMALLINT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    version BIGINT NOT NULL,
+    PRIMARY KEY (z, x, y)
+);
@@ -1,38 +1,210 @@
 # models.py
 import uuid
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy import BigInteger, Column, Computed, Float, String, Integer, SmallInteger, DateTime, ForeignKey, Index, Sequence, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from geoalchemy2 import Geometry
+from geoalchemy2 import Geography, Geometry
 from database import Base
 
+# Global change counter for hazard data; advanced after every committed write
+# and used as the ETag base of the read endpoints
+hazard_change_seq = Sequence("hazard_change_seq", metadata=Base.metadata)
+
 class HazardReport(Base):
     __tablename__ = "hazard_reports"
 
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
-    hazard_type = Column(String, index=True, nullable=False)
-    geom = Column(Geometry("POINT", srid=4326), nullable=False)
+    hazard_type = Column(String, nullable=False)
+    geom = Column(Geometry("POINT", srid=4326, spatial_index=False), nullable=False)
+    # Stored copies of the point coordinates, maintained by PostgreSQL, so
+    # reads get plain floats without decoding geometry
+    longitude = Column(Float, Computed("ST_X(geom)", persisted=True))
+    latitude = Column(Float, Computed("ST_Y(geom)", persisted=True))
     severity = Column(Integer)
     description = Column(String, nullable=True)
-    report_time = Column(DateTime(timezone=True), server_default=func.now())
+    # Partition key of the range-partitioned table, hence part of the primary key
+    report_time = Column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now())
+    # Duplicate submissions merged into this report at ingest (see crud.create_hazard_report)
+    corroboration_count = Column(Integer, nullable=False, server_default=text("1"))
+    last_corroborated_at = Column(DateTime(timezone=True), nullable=True)
+    # Insert time, independent of the client-supplied report_time; the
+    # incremental hotspot refresh (tasks/incremental_hotspots.py) reads new rows by it
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     # Relationship
     user = relationship("User", back_populates="reports")
 
+    # Kept in step with migrations/; check_indexes.py verifies the hot queries use them
+    __table_args__ = (
+        Index("idx_hazard_reports_geom", "geom", postgresql_using="gist"),
+        # Keyset pagination walks (report_time, id) newest first; the leading
+        # column also serves the hotspot tasks' report_time >= threshold filters
+        Index("ix_hazard_reports_report_time_id", "report_time", "id"),
+        Index("ix_hazard_reports_user_id_report_time", "user_id", "report_time"),
+        # Read filters: hazard_type=... within a time window, and the common
+        # "recent and severe" view (any min_severity >= 4 can use the partial index)
+        Index("ix_hazard_reports_hazard_type_report_time", "hazard_type", "report_time"),
+        Index("ix_hazard_reports_severe_report_time", "report_time", postgresql_where=text("severity >= 4")),
+        Index("ix_hazard_reports_created_at", "created_at"),
+        # Partitions are created and retired by tasks/partitions.py
+        {"postgresql_partition_by": "RANGE (report_time)"},
+    )
+
+class HazardReportMerge(Base):
+    """
+    Buffered submission merged into an existing report at flush time
+    (crud.bulk_create_hazard_reports), so a replayed stream entry is not
+    merged twice. Rows are pruned after crud.MERGE_RECORD_TTL.
+    """
+    __tablename__ = "hazard_report_merges"
+
+    submission_id = Column(PG_UUID(as_uuid=True), primary_key=True)
+    # No foreign key: hazard_reports is partitioned and its primary key is (id, report_time)
+    report_id = Column(PG_UUID(as_uuid=True), nullable=False)
+    merged_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_hazard_report_merges_merged_at", "merged_at"),
+    )
+
+class HazardTileVersion(Base):
+    """
+    hazard_change_seq value of the last write inside each XYZ tile up to
+    tiles.TILE_CACHE_MAX_ZOOM (crud.hazards_changed). Tile ETags and cached
+    tiles are keyed by it, so a write only retires the tiles containing it.
+    """
+    __tablename__ = "hazard_tile_versions"
+
+    z = Column(SmallInteger, primary_key=True)
+    x = Column(Integer, primary_key=True)
+    y = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
 class Media(Base):
     __tablename__ = "media"
     
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
-    hazard_report_id = Column(PG_UUID(as_uuid=True), ForeignKey("hazard_reports.id"), nullable=True)
+    # No foreign key: hazard_reports is partitioned and its primary key is (id, report_time)
+    hazard_report_id = Column(PG_UUID(as_uuid=True), nullable=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_type = Column(String, nullable=False)  # image, video, audio
     file_size = Column(Integer, nullable=False)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    # JPEG thumbnail written by tasks.media.generate_media_preview; null until then
+    preview_path = Column(String, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="media")
-    hazard_report = relationship("HazardReport")
+    hazard_report = relationship(
+        "HazardReport",
+        primaryjoin="foreign(Media.hazard_report_id) == HazardReport.id",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        Index("idx_media_user_id", "user_id"),
+        Index("idx_media_hazard_report_id", "hazard_report_id"),
+    )
+
+class HotspotCluster(Base):
+    """A hotspot maintained by tasks/incremental_hotspots.py; summary columns are recomputed from its members"""
+    __tablename__ = "hotspot_clusters"
+
+    id = Column(BigInteger, primary_key=True)
+    point_count = Column(Integer, nullable=False, server_default=text("0"))
+    latitude = Column(Float)
+    longitude = Column(Float)
+    average_severity = Column(Float)
+    hazard_types = Column(ARRAY(String), nullable=False, server_default=text("'{}'"))
+    first_report_time = Column(DateTime(timezone=True))
+    last_report_time = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_hotspot_clusters_point_count", "point_count"),
+    )
+
+class HotspotMember(Base):
+    """A hazard report inside the hotspot window with its DBSCAN neighbour count"""
+    __tablename__ = "hotspot_members"
+
+    # No foreign key, as for media: reports expire from here before they leave hazard_reports
+    report_id = Column(PG_UUID(as_uuid=True), primary_key=True)
+    report_time = Column(DateTime(timezone=True), nullable=False)
+    longitude = Column(Float, nullable=False)
+    latitude = Column(Float, nullable=False)
+    geog = Column(
+        Geography("POINT", srid=4326, spatial_index=False),
+        Computed("ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography", persisted=True),
+    )
+    hazard_type = Column(String, nullable=False)
+    severity = Column(Integer)
+    # Members within eps_km, this one included; core points have >= min_samples
+    neighbours = Column(Integer, nullable=False, server_default=text("1"))
+    # Null for noise
+    cluster_id = Column(BigInteger, ForeignKey("hotspot_clusters.id", ondelete="SET NULL"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_hotspot_members_geog", "geog", postgresql_using="gist"),
+        Index("ix_hotspot_members_report_time", "report_time"),
+        Index("ix_hotspot_members_cluster_id", "cluster_id"),
+    )
+
+class HotspotState(Base):
+    """Single row (id = 1): parameters the hotspot state was built with and the ingest watermark"""
+    __tablename__ = "hotspot_state"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    eps_km = Column(Float, nullable=False)
+    min_samples = Column(Integer, nullable=False)
+    window_hours = Column(Float, nullable=False)
+    # Highest hazard_reports.created_at already folded in
+    watermark = Column(DateTime(timezone=True), nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+    rebuilt_at = Column(DateTime(timezone=True), nullable=False)
+
+class HazardHexAggregate(Base):
+    """
+    Report counts per hexagon (hexgrid.py), resolution, time bucket and
+    hazard type, maintained by tasks/hex_pyramid.py
+    """
+    __tablename__ = "hazard_hex_aggregates"
+
+    resolution = Column(SmallInteger, primary_key=True)
+    bucket_width = Column(String, primary_key=True)  # hour | day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    hazard_type = Column(String, primary_key=True)
+    q = Column(Integer, primary_key=True)
+    r = Column(Integer, primary_key=True)
+    # Hexagon centre, for bbox filters
+    longitude = Column(Float, nullable=False)
+    latitude = Column(Float, nullable=False)
+    report_count = Column(Integer, nullable=False)
+    # Over reports with a severity; severity_count can be below report_count
+    severity_sum = Column(Float, nullable=False)
+    severity_count = Column(Integer, nullable=False)
+    max_severity = Column(Integer)
+
+    __table_args__ = (
+        # Retention deletes by bucket across all resolutions
+        Index("ix_hazard_hex_aggregates_bucket", "bucket_width", "bucket_start"),
+    )
+
+class HexPyramidState(Base):
+    """Single row (id = 1): grid the aggregates were built with and the ingest watermark"""
+    __tablename__ = "hex_pyramid_state"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    grid = Column(String, nullable=False)
+    # Reports with created_at up to here are counted
+    watermark = Column(DateTime(timezone=True), nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+    rebuilt_at = Column(DateTime(timezone=True), nullable=False)
+
+# HazardReport.user resolves "User" by name; make sure it is registered even
+# when only this module is imported (Celery tasks, scripts)
+import auth.models  # noqa: E402,F401
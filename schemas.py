@@ -22,18 +22,19 @@ class HazardReport(BaseModel):
     report_time: datetime
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    corroboration_count: int = 1
+
+    class Config:
+        from_attributes = True
+
+class MediaResponse(BaseModel):
+    id: uuid.UUID
+    hazard_report_id: Optional[uuid.UUID] = None
+    filename: str
+    file_type: str
+    file_size: int
+    uploaded_at: datetime
+    preview_path: Optional[str] = None
 
     class Config:
         from_attributes = True
-        
-    @classmethod
-    def from_orm(cls, obj):
-        # Extract latitude and longitude from geometry if available
-        data = {
-            "id": obj.id,
-            "hazard_type": obj.hazard_type,
-            "severity": obj.severity,
-            "description": obj.description,
-            "report_time": obj.report_time
-        }
-        return cls(**data)
@@ -0,0 +1,175 @@
+# tasks/hex_pyramid.py
+"""
+Precomputed hexagon pyramid behind GET /hotspots/hex.
+
+hazard_hex_aggregates holds report counts and severity per hexagon
+(hexgrid.py) for every resolution in HEX_RESOLUTIONS, per hazard type and
+per hour and day bucket. Hour buckets are kept for HEX_HOURLY_RETENTION_HOURS
+and day buckets for HEX_DAILY_RETENTION_DAYS.
+
+Beat runs refresh_hex_pyramid every HEX_REFRESH_SECONDS. Each run adds the
+reports inserted since the watermark (hazard_reports.created_at), up to
+HEX_SETTLE_SECONDS ago, so a transaction still committing is not skipped
+for good. Cells are computed with NumPy and added to existing rows with
+INSERT ... ON CONFLICT. A full rebuild runs every HEX_REBUILD_SECONDS or
+when the grid settings change; it also counts the rare report committed
+later than the settle delay.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from celery import shared_task
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import engine
+import hexgrid
+import models
+
+load_dotenv()
+
+HOURLY_RETENTION_HOURS = int(os.getenv("HEX_HOURLY_RETENTION_HOURS", "168"))
+DAILY_RETENTION_DAYS = int(os.getenv("HEX_DAILY_RETENTION_DAYS", "365"))
+REBUILD_SECONDS = float(os.getenv("HEX_REBUILD_SECONDS", "86400"))
+SETTLE = timedelta(seconds=float(os.getenv("HEX_SETTLE_SECONDS", "10")))
+# Reports read and aggregated per round trip
+FOLD_BATCH = int(os.getenv("HEX_FOLD_BATCH", "50000"))
+LOCK_KEY = 4171905
+
+BUCKET_SECONDS = {"hour": 3600, "day": 86400}
+
+hr = models.HazardReport
+aggregates = models.HazardHexAggregate.__table__
+state_table = models.HexPyramidState.__table__
+
+def grid_signature() -> str:
+    return f"{hexgrid.BASE_SIZE_M:g}:{','.join(map(str, hexgrid.RESOLUTIONS))}"
+
+def horizons(now: datetime) -> dict:
+    """Oldest bucket_start kept per bucket width"""
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    return {
+        "hour": hour - timedelta(hours=HOURLY_RETENTION_HOURS),
+        "day": hour.replace(hour=0) - timedelta(days=DAILY_RETENTION_DAYS),
+    }
+
+def aggregate_rows(rows, bucket_horizons: dict) -> list[dict]:
+    """
+    hazard_hex_aggregates rows for (report_time, hazard_type, severity,
+    longitude, latitude) tuples: one np.unique per resolution and bucket
+    width over (bucket, type, q, r), and bincounts for the sums.
+    """
+    if not rows:
+        return []
+    times, hazard_types, severities, longitudes, latitudes = zip(*rows)
+    epoch = np.array([t.timestamp() for t in times]).astype(np.int64)
+    names, type_code = np.unique(np.asarray(hazard_types, dtype=object).astype(str), return_inverse=True)
+    names = names.tolist()
+    severity = np.array(severities, dtype=np.float64)
+    rated = ~np.isnan(severity)
+
+    out = []
+    for resolution in hexgrid.RESOLUTIONS:
+        q, r = hexgrid.cells(longitudes, latitudes, resolution)
+        for width, seconds in BUCKET_SECONDS.items():
+            start = epoch // seconds * seconds
+            keep = start >= int(bucket_horizons[width].timestamp())
+            if not keep.any():
+                continue
+            keys, group, counts = np.unique(
+                np.column_stack((start, type_code, q, r))[keep], axis=0, return_inverse=True, return_counts=True
+            )
+            group = group.reshape(-1)
+            kept_severity, kept_rated = severity[keep], rated[keep]
+            sums = np.bincount(group, weights=np.where(kept_rated, kept_severity, 0.0), minlength=len(keys))
+            rated_counts = np.bincount(group, weights=kept_rated, minlength=len(keys))
+            maxima = np.full(len(keys), np.nan)
+            np.fmax.at(maxima, group, kept_severity)
+            for (bucket, code, cell_q, cell_r), n, total, n_rated, top in zip(
+                keys.tolist(), counts.tolist(), sums.tolist(), rated_counts.tolist(), maxima.tolist()
+            ):
+                lon, lat = hexgrid.center(cell_q, cell_r, resolution)
+                out.append({
+                    "resolution": resolution, "bucket_width": width,
+                    "bucket_start": datetime.fromtimestamp(bucket, timezone.utc), "hazard_type": names[code],
+                    "q": cell_q, "r": cell_r, "longitude": lon, "latitude": lat,
+                    "report_count": n, "severity_sum": total, "severity_count": int(n_rated),
+                    "max_severity": None if np.isnan(top) else int(top),
+                })
+    return out
+
+def add_aggregates(conn, values: list[dict]):
+    if not values:
+        return
+    stmt = pg_insert(aggregates)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[c for c in aggregates.primary_key.columns],
+        set_={
+            "report_count": aggregates.c.report_count + stmt.excluded.report_count,
+            "severity_sum": aggregates.c.severity_sum + stmt.excluded.severity_sum,
+            "severity_count": aggregates.c.severity_count + stmt.excluded.severity_count,
+            "max_severity": func.greatest(aggregates.c.max_severity, stmt.excluded.max_severity),
+        },
+    ), values)
+
+def fold(conn, filters, bucket_horizons: dict) -> int:
+    """Add the reports matching filters to the aggregates, FOLD_BATCH rows at a time; returns the report count"""
+    result = conn.execution_options(yield_per=FOLD_BATCH).execute(
+        select(hr.report_time, hr.hazard_type, hr.severity, hr.longitude, hr.latitude).where(*filters)
+    )
+    folded = 0
+    for batch in result.partitions():
+        add_aggregates(conn, aggregate_rows(batch, bucket_horizons))
+        folded += len(batch)
+    return folded
+
+def expire(conn, bucket_horizons: dict) -> int:
+    retired = 0
+    for width, horizon in bucket_horizons.items():
+        retired += conn.execute(
+            delete(aggregates).where(aggregates.c.bucket_width == width, aggregates.c.bucket_start < horizon)
+        ).rowcount
+    return retired
+
+@shared_task
+def refresh_hex_pyramid(full: bool = False):
+    """Add newly inserted reports to the hexagon pyramid, or rebuild it when due"""
+    with engine.begin() as conn:
+        if not conn.execute(select(func.pg_try_advisory_xact_lock(LOCK_KEY))).scalar():
+            return {"status": "skipped", "reason": "refresh already running"}
+        now = conn.execute(select(func.now())).scalar_one()
+        settled = now - SETTLE
+        bucket_horizons = horizons(now)
+        state = conn.execute(select(state_table).where(state_table.c.id == 1)).first()
+
+        if full:
+            reason = "requested"
+        elif state is None:
+            reason = "initial"
+        elif state.grid != grid_signature():
+            reason = "grid changed"
+        elif (now - state.rebuilt_at).total_seconds() >= REBUILD_SECONDS:
+            reason = "scheduled"
+        else:
+            reason = None
+
+        filters = [hr.report_time >= bucket_horizons["day"], hr.created_at <= settled]
+        if reason:
+            # DELETE, not TRUNCATE: TRUNCATE's ACCESS EXCLUSIVE lock would block
+            # /hotspots/hex for the whole rebuild; readers keep the old rows until commit
+            conn.execute(delete(aggregates))
+        else:
+            filters.append(hr.created_at > state.watermark)
+        folded = fold(conn, filters, bucket_horizons)
+        retired = expire(conn, bucket_horizons)
+
+        values = {"grid": grid_signature(), "watermark": settled, "refreshed_at": now,
+                  "rebuilt_at": now if reason else state.rebuilt_at}
+        stmt = pg_insert(state_table).values(id=1, **values)
+        conn.execute(stmt.on_conflict_do_update(index_elements=[state_table.c.id], set_=values))
+    return {"status": "rebuilt" if reason else "incremental", "reason": reason, "reports": folded, "rows_retired": retired}
+
+if __name__ == "__main__":
+    print(refresh_hex_pyramid(full=True))
@@ -1,124 +1,120 @@
 # tasks/hotspots.py
 from celery import shared_task
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import select
 from database import SessionLocal
 from models import HazardReport
-from geoalchemy2.functions import ST_AsGeoJSON, ST_Point, ST_Intersects, ST_MakeEnvelope
-from datetime import datetime, timedelta
-import json
-import math
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import crud
+import os
+
+# Cell edge in degrees; a call can pass its own grid_size
+GRID_SIZE = float(os.getenv("HOTSPOT_GRID_SIZE", "0.1"))
 
 @shared_task
-def generate_hotspots(time_window_hours=24, bbox=None, min_reports=3):
+def generate_hotspots(time_window_hours=24, bbox=None, min_reports=3, grid_size=None):
     """Generate hazard hotspots based on report density"""
+    grid_size = grid_size or GRID_SIZE
     db = SessionLocal()
     try:
-        # Calculate time window
-        time_threshold = datetime.utcnow() - timedelta(hours=time_window_hours)
-        
-        # Base query
-        query = db.query(HazardReport).filter(
-            HazardReport.report_time >= time_threshold
+        # Time window and bbox are filtered in SQL on the report_time / geom indexes
+        time_threshold = datetime.now(timezone.utc) - timedelta(hours=time_window_hours)
+        filters = crud.hazard_report_filters(
+            bbox=bbox if bbox and len(bbox) == 4 else None,
+            since=time_threshold,
         )
-        
-        # Apply bounding box filter if provided
-        if bbox and len(bbox) == 4:
-            min_lon, min_lat, max_lon, max_lat = bbox
-            envelope = ST_MakeEnvelope(min_lon, min_lat, max_lon, max_lat, 4326)
-            query = query.filter(ST_Intersects(HazardReport.geom, envelope))
-        
-        recent_reports = query.all()
-        
-        if not recent_reports:
-            return {"hotspots": [], "total_reports": 0}
-        
-        # Convert to GeoJSON for clustering
-        features = []
-        for report in recent_reports:
-            # Get coordinates from geometry
-            stmt = db.query(ST_AsGeoJSON(HazardReport.geom)).filter(HazardReport.id == report.id)
-            geojson_str = db.execute(stmt).scalar_one()
-            geometry = json.loads(geojson_str)
-            
-            features.append({
-                "type": "Feature",
-                "geometry": geometry,
-                "properties": {
-                    "id": str(report.id),
-                    "hazard_type": report.hazard_type,
-                    "severity": report.severity,
-                    "report_time": report.report_time.isoformat() if report.report_time else None
-                }
-            })
-        
-        # Simple grid-based clustering
-        hotspots = self.cluster_reports(features, grid_size=0.1, min_reports=min_reports)
-        
-        return {
-            "hotspots": hotspots,
-            "total_reports": len(recent_reports),
-            "time_window_hours": time_window_hours,
-            "generated_at": datetime.utcnow().isoformat()
-        }
-        
+        recent_reports = db.execute(
+            select(HazardReport.id, HazardReport.hazard_type, HazardReport.severity,
+                   HazardReport.longitude, HazardReport.latitude).where(*filters)
+        ).all()
     finally:
         db.close()
 
-def cluster_reports(self, features, grid_size=0.1, min_reports=3):
-    """Cluster reports using a simple grid-based approach"""
-    grid_cells = {}
-    
-    for feature in features:
-        coords = feature["geometry"]["coordinates"]
-        if coords and len(coords) == 2:
-            lon, lat = coords
-            # Calculate grid cell
-            grid_x = math.floor(lon / grid_size) * grid_size
-            grid_y = math.floor(lat / grid_size) * grid_size
-            grid_key = f"{grid_x}_{grid_y}"
-            
-            if grid_key not in grid_cells:
-                grid_cells[grid_key] = {
-                    "count": 0,
-                    "total_severity": 0,
-                    "hazard_types": set(),
-                    "reports": [],
-                    "center_lon": grid_x + grid_size / 2,
-                    "center_lat": grid_y + grid_size / 2
-                }
-            
-            cell = grid_cells[grid_key]
-            cell["count"] += 1
-            cell["total_severity"] += feature["properties"].get("severity", 0)
-            cell["hazard_types"].add(feature["properties"].get("hazard_type", "unknown"))
-            cell["reports"].append(feature["properties"]["id"])
-    
-    # Filter and format hotspots
+    if not recent_reports:
+        return {"hotspots": [], "total_reports": 0}
+
+    ids, hazard_types, severities, longitudes, latitudes = zip(*recent_reports)
+    hotspots = grid_hotspots(
+        [str(i) for i in ids], longitudes, latitudes, severities, hazard_types,
+        grid_size=grid_size, min_reports=min_reports,
+    )
+    return {
+        "hotspots": hotspots,
+        "total_reports": len(recent_reports),
+        "time_window_hours": time_window_hours,
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+def grid_hotspots(report_ids, longitudes, latitudes, severities, hazard_types, grid_size=GRID_SIZE, min_reports=3):
+    """
+    Grid-based clustering over coordinate arrays. Cell indices come from
+    floor division, and per-cell counts, severity sums and hazard types
+    from np.unique / bincount over the cell index, with no per-report loop.
+    Missing severities count as 0.
+    """
+    lon = np.asarray(longitudes, dtype=np.float64)
+    lat = np.asarray(latitudes, dtype=np.float64)
+    if len(lon) == 0:
+        return []
+    gx = np.floor(lon / grid_size).astype(np.int64)
+    gy = np.floor(lat / grid_size).astype(np.int64)
+    # One integer key per cell, so a 1-D unique does the grouping
+    rows = int(gy.max() - gy.min()) + 1
+    cells, cell_of, counts = np.unique((gx - gx.min()) * rows + (gy - gy.min()), return_inverse=True, return_counts=True)
+    cell_x = cells // rows + gx.min()
+    cell_y = cells % rows + gy.min()
+
+    severity = np.nan_to_num(np.array(severities, dtype=np.float64), nan=0.0)
+    average_severity = np.bincount(cell_of, weights=severity) / counts
+
+    names, type_of = np.unique(np.asarray(hazard_types, dtype=object).astype(str), return_inverse=True)
+    pairs = np.unique(cell_of.astype(np.int64) * len(names) + type_of)
+    types_per_cell = [[] for _ in range(len(cells))]
+    names = names.tolist()
+    for cell, code in zip((pairs // len(names)).tolist(), (pairs % len(names)).tolist()):
+        types_per_cell[cell].append(names[code])
+
+    # Report ids grouped by cell: a stable sort by cell keeps query order within each cell
+    order = np.argsort(cell_of, kind="stable")
+    ids = np.asarray(report_ids, dtype=object)[order]
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+
     hotspots = []
-    for grid_key, cell in grid_cells.items():
-        if cell["count"] >= min_reports:
-            avg_severity = cell["total_severity"] / cell["count"] if cell["count"] > 0 else 0
-            
-            hotspot = {
-                "id": f"hotspot_{grid_key}",
-                "center": [cell["center_lon"], cell["center_lat"]],
-                "count": cell["count"],
-                "average_severity": round(avg_severity, 2),
-                "hazard_types": list(cell["hazard_types"]),
-                "report_ids": cell["reports"],
-                "radius": min(5.0, cell["count"] * 0.5),  # Dynamic radius based on count
-                "intensity": self.calculate_intensity(cell["count"], avg_severity),
-                "grid_size": grid_size
-            }
-            hotspots.append(hotspot)
-    
+    for cell in np.flatnonzero(counts >= min_reports).tolist():
+        count = int(counts[cell])
+        avg_severity = float(average_severity[cell])
+        grid_x = int(cell_x[cell]) * grid_size
+        grid_y = int(cell_y[cell]) * grid_size
+        hotspots.append({
+            "id": f"hotspot_{grid_x}_{grid_y}",
+            "center": [grid_x + grid_size / 2, grid_y + grid_size / 2],
+            "count": count,
+            "average_severity": round(avg_severity, 2),
+            "hazard_types": types_per_cell[cell],
+            "report_ids": ids[bounds[cell]:bounds[cell + 1]].tolist(),
+            "radius": min(5.0, count * 0.5),  # Dynamic radius based on count
+            "intensity": calculate_intensity(count, avg_severity),
+            "grid_size": grid_size
+        })
+
     # Sort by intensity (most critical first)
     hotspots.sort(key=lambda x: x["intensity"], reverse=True)
-    
     return hotspots
 
-def calculate_intensity(self, count, avg_severity):
+def cluster_reports(features, grid_size=GRID_SIZE, min_reports=3):
+    """Cluster GeoJSON point features using a simple grid-based approach"""
+    points = [f for f in features if len(f["geometry"].get("coordinates") or []) == 2]
+    return grid_hotspots(
+        [f["properties"]["id"] for f in points],
+        [f["geometry"]["coordinates"][0] for f in points],
+        [f["geometry"]["coordinates"][1] for f in points],
+        [f["properties"].get("severity") for f in points],
+        [f["properties"].get("hazard_type", "unknown") for f in points],
+        grid_size=grid_size,
+        min_reports=min_reports,
+    )
+
+def calculate_intensity(count, avg_severity):
     """Calculate hotspot intensity score"""
     # Weight count more heavily than severity
     intensity = (count * 0.7) + (avg_severity * 0.3)
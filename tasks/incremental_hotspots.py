@@ -0,0 +1,355 @@
+# tasks/incremental_hotspots.py
+"""
+DBSCAN hotspots kept up to date incrementally instead of reclustering the
+whole window on every run.
+
+State lives in hotspot_members (every report in the window with its
+neighbour count) and hotspot_clusters (migrations/0009). A refresh:
+
+- expires members older than the window, decrements their neighbours'
+  counts, and dissolves clusters left without a core point;
+- adds reports inserted since the watermark (hazard_reports.created_at),
+  counts neighbours with one ST_DWithin join on the member index, links
+  points that became core to the clusters around them with a union-find,
+  which may create a cluster or merge several into the oldest one, and
+  attaches new non-core points to the cluster of a core neighbour;
+- recomputes the summary row of every cluster it touched.
+
+The cost follows the number of reports added and expired, not the window
+size. Removals only shrink or dissolve clusters; a cluster that should
+split stays whole until the next full rebuild, which also picks up reports
+committed later than HOTSPOT_WATERMARK_LAG_SECONDS after their insert
+time. A rebuild reclusters the window with tasks.ml_clustering and runs
+every HOTSPOT_REBUILD_SECONDS, when the parameters change, or when more
+than HOTSPOT_BATCH_LIMIT reports arrived since the last refresh.
+"""
+import os
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import numpy as np
+from celery import shared_task
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, delete, distinct, exists, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import engine
+from tasks.ml_clustering import EARTH_RADIUS_KM, haversine_dbscan
+import crud
+import models
+
+load_dotenv()
+
+EPS_KM = float(os.getenv("HOTSPOT_EPS_KM", "1.0"))
+MIN_SAMPLES = int(os.getenv("HOTSPOT_MIN_SAMPLES", "3"))
+WINDOW_HOURS = float(os.getenv("HOTSPOT_WINDOW_HOURS", "24"))
+REBUILD_SECONDS = float(os.getenv("HOTSPOT_REBUILD_SECONDS", "900"))
+BATCH_LIMIT = int(os.getenv("HOTSPOT_BATCH_LIMIT", "5000"))
+# Reports are read from watermark minus this, so rows whose transaction
+# committed a little after its insert time are not skipped
+WATERMARK_LAG = timedelta(seconds=float(os.getenv("HOTSPOT_WATERMARK_LAG_SECONDS", "30")))
+# Refreshes that find the previous one still running skip instead of queueing
+LOCK_KEY = 4171904
+
+hr = models.HazardReport
+members = models.HotspotMember.__table__
+clusters = models.HotspotCluster.__table__
+state_table = models.HotspotState.__table__
+
+def eps_metres(eps_km: float = EPS_KM) -> float:
+    return eps_km * 1000.0
+
+def neighbour_pairs(report_ids, eps_m: float):
+    """(report_id, neighbour_id, neighbour's neighbour count, neighbour's cluster) for members within eps_m, self included"""
+    p, q = members.alias("p"), members.alias("q")
+    # use_spheroid=false: the same sphere as the haversine rebuild
+    return (
+        select(p.c.report_id, q.c.report_id, q.c.neighbours, q.c.cluster_id)
+        .select_from(p.join(q, func.ST_DWithin(p.c.geog, q.c.geog, eps_m, False)))
+        .where(p.c.report_id.in_(report_ids))
+    )
+
+def shift_neighbours(conn, deltas: dict):
+    if deltas:
+        conn.execute(
+            update(members).where(members.c.report_id == bindparam("member_id"))
+            .values(neighbours=members.c.neighbours + bindparam("delta")),
+            [{"member_id": report_id, "delta": delta} for report_id, delta in deltas.items()],
+        )
+
+def plan_links(pairs, min_samples: int):
+    """
+    Group points that just became core with the core points and clusters
+    they reach, given neighbour_pairs rows for those points.
+
+    Returns a list of (cluster ids, report ids) components: the existing
+    clusters the component joins (empty for a new cluster) and the reports
+    to assign to it, namely points without a cluster that are core or
+    border to one of the new core points.
+    """
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a, b):
+        parent[find(a)] = find(b)
+
+    unassigned = set()
+    border = {}
+    for core_id, other_id, other_neighbours, other_cluster in pairs:
+        find(("report", core_id))
+        if other_neighbours >= min_samples:
+            # Core reaches core: same cluster, and so is whatever cluster the other is in
+            union(("report", other_id), ("report", core_id))
+            if other_cluster is not None:
+                union(("cluster", other_cluster), ("report", core_id))
+            else:
+                unassigned.add(other_id)
+        elif other_cluster is None:
+            border.setdefault(other_id, core_id)
+
+    components = defaultdict(lambda: (set(), set()))
+    for kind, key in list(parent):
+        cluster_ids, report_ids = components[find((kind, key))]
+        if kind == "cluster":
+            cluster_ids.add(key)
+        elif key in unassigned:
+            report_ids.add(key)
+    for report_id, core_id in border.items():
+        components[find(("report", core_id))][1].add(report_id)
+    return [(sorted(cluster_ids), report_ids) for cluster_ids, report_ids in components.values()]
+
+def plan_borders(pairs, min_samples: int) -> dict:
+    """
+    Clusters for points that are not core and not in a cluster, given
+    neighbour_pairs rows for those points (the self pair included): each
+    joins the cluster of a core neighbour, the lowest cluster id when it
+    reaches several. Returns {report id: cluster id}.
+    """
+    skip, borders = set(), {}
+    for report_id, other_id, other_neighbours, other_cluster in pairs:
+        if report_id == other_id:
+            if other_neighbours >= min_samples or other_cluster is not None:
+                skip.add(report_id)
+        elif other_neighbours >= min_samples and other_cluster is not None:
+            borders[report_id] = min(borders.get(report_id, other_cluster), other_cluster)
+    return {report_id: cluster_id for report_id, cluster_id in borders.items() if report_id not in skip}
+
+def apply_links(conn, components) -> tuple[set, int, int]:
+    """Create or merge clusters for plan_links components; returns (touched cluster ids, created, merged)"""
+    touched, created, merged = set(), 0, 0
+    for cluster_ids, report_ids in components:
+        if cluster_ids:
+            # The oldest cluster survives a merge, so its id stays stable for clients
+            target, absorbed = cluster_ids[0], cluster_ids[1:]
+        else:
+            target, absorbed = conn.execute(insert(clusters).returning(clusters.c.id)).scalar_one(), []
+            created += 1
+        condition = members.c.report_id.in_(report_ids)
+        if absorbed:
+            condition = condition | members.c.cluster_id.in_(absorbed)
+        conn.execute(update(members).where(condition).values(cluster_id=target))
+        if absorbed:
+            conn.execute(delete(clusters).where(clusters.c.id.in_(absorbed)))
+            merged += len(absorbed)
+        touched.add(target)
+    return touched, created, merged
+
+def dissolve_coreless(conn, cluster_ids, min_samples: int) -> set:
+    """Delete clusters without a core member left; their members fall back to noise"""
+    if not cluster_ids:
+        return set()
+    has_core = exists().where(members.c.cluster_id == clusters.c.id, members.c.neighbours >= min_samples)
+    return set(conn.execute(
+        delete(clusters).where(clusters.c.id.in_(cluster_ids), ~has_core).returning(clusters.c.id)
+    ).scalars())
+
+def summarise_clusters(conn, cluster_ids):
+    """Recompute count, centre, severity, hazard types and time span of these clusters from their members"""
+    if not cluster_ids:
+        return
+    lat, lon = func.radians(members.c.latitude), func.radians(members.c.longitude)
+    stats = (
+        select(
+            members.c.cluster_id,
+            func.count().label("n"),
+            # Centre as the mean unit vector, as in tasks.ml_clustering
+            func.sum(func.cos(lat) * func.cos(lon)).label("x"),
+            func.sum(func.cos(lat) * func.sin(lon)).label("y"),
+            func.sum(func.sin(lat)).label("z"),
+            func.avg(members.c.severity).label("severity"),
+            func.array_agg(distinct(members.c.hazard_type)).label("hazard_types"),
+            func.min(members.c.report_time).label("first"),
+            func.max(members.c.report_time).label("last"),
+        )
+        .where(members.c.cluster_id.in_(cluster_ids))
+        .group_by(members.c.cluster_id)
+        .subquery()
+    )
+    conn.execute(
+        update(clusters).where(clusters.c.id == stats.c.cluster_id).values(
+            point_count=stats.c.n,
+            latitude=func.degrees(func.atan2(stats.c.z, func.sqrt(stats.c.x * stats.c.x + stats.c.y * stats.c.y))),
+            longitude=func.degrees(func.atan2(stats.c.y, stats.c.x)),
+            average_severity=stats.c.severity,
+            hazard_types=stats.c.hazard_types,
+            first_report_time=stats.c.first,
+            last_report_time=stats.c.last,
+            updated_at=func.now(),
+        )
+    )
+
+def expire_members(conn, window_start, eps_m: float, min_samples: int) -> tuple[int, set]:
+    """Drop members older than the window; returns (expired count, surviving clusters that lost members or core points)"""
+    p, q = members.alias("p"), members.alias("q")
+    losses = conn.execute(
+        select(q.c.report_id, q.c.cluster_id, func.count())
+        .select_from(p.join(q, func.ST_DWithin(p.c.geog, q.c.geog, eps_m, False)))
+        .where(p.c.report_time < window_start, q.c.report_time >= window_start)
+        .group_by(q.c.report_id, q.c.cluster_id)
+    ).all()
+    shift_neighbours(conn, {report_id: -n for report_id, _, n in losses})
+    gone = conn.execute(
+        delete(members).where(members.c.report_time < window_start).returning(members.c.cluster_id)
+    ).scalars().all()
+    touched = {c for c in gone if c is not None} | {c for _, c, _ in losses if c is not None}
+    return len(gone), touched - dissolve_coreless(conn, touched, min_samples)
+
+def add_members(conn, rows, eps_m: float, min_samples: int) -> tuple[set, int, int]:
+    """
+    Insert new reports, update neighbour counts, link new core points and
+    attach new border points; returns (touched cluster ids, created, merged)
+    """
+    if not rows:
+        return set(), 0, 0
+    conn.execute(insert(members), [
+        {"report_id": r.id, "report_time": r.report_time, "longitude": r.longitude, "latitude": r.latitude,
+         "hazard_type": r.hazard_type, "severity": r.severity, "neighbours": 0}
+        for r in rows
+    ])
+    new = {r.id for r in rows}
+    deltas, before = Counter(), {}
+    for report_id, other_id, other_neighbours, _ in conn.execute(neighbour_pairs(new, eps_m)):
+        # Every pair counts toward the new point; pairs with an old member count toward it too
+        deltas[report_id] += 1
+        if other_id not in new:
+            deltas[other_id] += 1
+            before[other_id] = other_neighbours
+    shift_neighbours(conn, deltas)
+
+    became_core = {r for r in new if deltas[r] >= min_samples}
+    became_core |= {r for r, n in before.items() if n < min_samples <= n + deltas[r]}
+    touched, created, merged = set(), 0, 0
+    if became_core:
+        pairs = conn.execute(neighbour_pairs(became_core, eps_m)).all()
+        touched, created, merged = apply_links(conn, plan_links(pairs, min_samples))
+
+    # A new point that is not core joins an existing cluster as a border point
+    # when one of its neighbours is a core point of that cluster
+    candidates = new - became_core
+    if candidates:
+        borders = plan_borders(conn.execute(neighbour_pairs(candidates, eps_m)).all(), min_samples)
+        if borders:
+            conn.execute(
+                update(members).where(members.c.report_id == bindparam("member_id"))
+                .values(cluster_id=bindparam("target")),
+                [{"member_id": report_id, "target": cluster_id} for report_id, cluster_id in borders.items()],
+            )
+            touched |= set(borders.values())
+    return touched, created, merged
+
+def rebuild(conn, window_start, eps_km: float, min_samples: int) -> dict:
+    """Recluster the whole window from hazard_reports and replace the stored state"""
+    rows = conn.execute(
+        select(hr.id, hr.report_time, hr.longitude, hr.latitude, hr.hazard_type, hr.severity)
+        .where(*crud.hazard_report_filters(since=window_start))
+    ).all()
+    # DELETE, not TRUNCATE: TRUNCATE's ACCESS EXCLUSIVE lock would block /hotspots
+    # reads for the whole rebuild; with DELETE they see the old state until commit
+    conn.execute(delete(members))
+    conn.execute(delete(clusters))
+    if not rows:
+        return {"members": 0, "clusters": 0}
+
+    # sklearn takes ~1s to import; load it on first use, not at worker boot
+    from sklearn.neighbors import BallTree
+
+    points = np.radians(np.array([(r.latitude, r.longitude) for r in rows], dtype=np.float64))
+    labels = haversine_dbscan(points[:, 0], points[:, 1], eps_km, min_samples)
+    neighbours = BallTree(points, metric="haversine").query_radius(points, eps_km / EARTH_RADIUS_KM, count_only=True)
+
+    n_clusters = int(labels.max()) + 1
+    cluster_ids = conn.execute(
+        insert(clusters).returning(clusters.c.id, sort_by_parameter_order=True), [{"point_count": 0}] * n_clusters
+    ).scalars().all() if n_clusters else []
+    conn.execute(insert(members), [
+        {"report_id": r.id, "report_time": r.report_time, "longitude": r.longitude, "latitude": r.latitude,
+         "hazard_type": r.hazard_type, "severity": r.severity, "neighbours": int(n),
+         "cluster_id": cluster_ids[label] if label >= 0 else None}
+        for r, label, n in zip(rows, labels.tolist(), neighbours.tolist())
+    ])
+    summarise_clusters(conn, cluster_ids)
+    return {"members": len(rows), "clusters": n_clusters}
+
+def rebuild_reason(state, now, requested: bool):
+    if requested:
+        return "requested"
+    if state is None:
+        return "initial"
+    if (state.eps_km, state.min_samples, state.window_hours) != (EPS_KM, MIN_SAMPLES, WINDOW_HOURS):
+        return "parameters changed"
+    if (now - state.rebuilt_at).total_seconds() >= REBUILD_SECONDS:
+        return "scheduled"
+    return None
+
+def save_state(conn, now, watermark, rebuilt_at):
+    values = {"eps_km": EPS_KM, "min_samples": MIN_SAMPLES, "window_hours": WINDOW_HOURS,
+              "watermark": watermark, "refreshed_at": now, "rebuilt_at": rebuilt_at}
+    stmt = pg_insert(state_table).values(id=1, **values)
+    conn.execute(stmt.on_conflict_do_update(index_elements=[state_table.c.id], set_=values))
+
+@shared_task
+def refresh_hotspots(full: bool = False):
+    """Fold new and expired reports into the stored hotspots, or rebuild them when due"""
+    eps_m = eps_metres()
+    with engine.begin() as conn:
+        if not conn.execute(select(func.pg_try_advisory_xact_lock(LOCK_KEY))).scalar():
+            return {"status": "skipped", "reason": "refresh already running"}
+        now = conn.execute(select(func.now())).scalar_one()
+        window_start = now - timedelta(hours=WINDOW_HOURS)
+        state = conn.execute(select(state_table).where(state_table.c.id == 1)).first()
+
+        reason = rebuild_reason(state, now, full)
+        if reason is None:
+            expired, touched = expire_members(conn, window_start, eps_m, MIN_SAMPLES)
+            rows = conn.execute(
+                select(hr.id, hr.report_time, hr.longitude, hr.latitude, hr.hazard_type, hr.severity, hr.created_at)
+                .where(
+                    hr.created_at > state.watermark - WATERMARK_LAG,
+                    hr.report_time >= window_start,
+                    ~exists().where(members.c.report_id == hr.id),
+                )
+                .order_by(hr.created_at)
+                .limit(BATCH_LIMIT + 1)
+            ).all()
+            if len(rows) <= BATCH_LIMIT:
+                linked, created, merged = add_members(conn, rows, eps_m, MIN_SAMPLES)
+                summarise_clusters(conn, touched | linked)
+                watermark = max([state.watermark] + [r.created_at for r in rows])
+                save_state(conn, now, watermark, state.rebuilt_at)
+                return {"status": "incremental", "added": len(rows), "expired": expired,
+                        "clusters_created": created, "clusters_merged": merged, "clusters_updated": len(touched | linked)}
+            # Reclustering is cheaper than linking this many points one neighbourhood at a time
+            reason = "backlog"
+
+        summary = rebuild(conn, window_start, EPS_KM, MIN_SAMPLES)
+        save_state(conn, now, now, now)
+    return {"status": "rebuilt", "reason": reason, **summary}
+
+if __name__ == "__main__":
+    print(refresh_hotspots(full=True))
@@ -0,0 +1,44 @@
+# tasks/ingest.py
+import logging
+import time
+
+from celery import shared_task
+from sqlalchemy import exc
+from database import SessionLocal
+import ingest_buffer
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 5
+
+@shared_task
+def flush_hazard_ingest(max_batches=50):
+    """Drain buffered hazard submissions into hazard_reports (scheduled by beat)"""
+    db = SessionLocal()
+    try:
+        flushed = 0
+        for _ in range(max_batches):
+            count = ingest_buffer.flush(db)
+            flushed += count
+            if count < ingest_buffer.INGEST_BATCH_SIZE:
+                break
+        return {"flushed": flushed}
+    finally:
+        db.close()
+
+def run_forever():
+    """Standalone flusher: blocks on the stream, so reports land within milliseconds"""
+    db = SessionLocal()
+    try:
+        while True:
+            try:
+                ingest_buffer.flush(db, block_ms=1000)
+            except exc.DBAPIError as e:
+                # The batch stays pending in the stream; wait for the database to come back
+                logger.warning("flush failed, retrying in %ss: %s", RETRY_SECONDS, e)
+                time.sleep(RETRY_SECONDS)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_forever()
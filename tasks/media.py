@@ -0,0 +1,55 @@
+# tasks/media.py
+import os
+import shutil
+import subprocess
+import uuid
+from pathlib import Path
+
+from celery import shared_task
+from database import SessionLocal
+import crud
+from uploads import UPLOAD_DIR
+
+PREVIEW_SIZE = int(os.getenv("MEDIA_PREVIEW_SIZE", "320"))
+PREVIEW_DIR = UPLOAD_DIR / "previews"
+
+def image_preview(source: Path, dest: Path):
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as img:
+        # JPEG decodes straight at reduced scale, so a 12 MP photo never expands in full
+        img.draft("RGB", (PREVIEW_SIZE, PREVIEW_SIZE))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+        img.convert("RGB").save(dest, "JPEG", quality=80)
+
+def video_preview(source: Path, dest: Path) -> bool:
+    """One frame a second in, scaled down by ffmpeg; False when ffmpeg is not installed"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    subprocess.run(
+        [ffmpeg, "-y", "-loglevel", "error", "-ss", "1", "-i", str(source),
+         "-frames:v", "1", "-vf", f"scale={PREVIEW_SIZE}:-2", str(dest)],
+        check=True, timeout=120,
+    )
+    return True
+
+@shared_task
+def generate_media_preview(media_id):
+    """Write a JPEG thumbnail for an uploaded image or video and record its path"""
+    db = SessionLocal()
+    try:
+        media = crud.get_media(db, uuid.UUID(str(media_id)))
+        if media is None:
+            return {"media_id": media_id, "status": "missing"}
+        PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+        dest = PREVIEW_DIR / f"{media.id}.jpg"
+        if media.file_type == "image":
+            image_preview(Path(media.file_path), dest)
+        elif media.file_type != "video" or not video_preview(Path(media.file_path), dest):
+            return {"media_id": media_id, "status": "skipped"}
+        crud.set_media_preview(db, media.id, str(dest))
+        return {"media_id": media_id, "status": "created", "preview_path": str(dest)}
+    finally:
+        db.close()
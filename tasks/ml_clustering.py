@@ -1,121 +1,243 @@
 from celery import shared_task
 import numpy as np
-from sklearn.cluster import DBSCAN
-from sklearn.preprocessing import StandardScaler
 from typing import List, Dict, Any
-import json
 
-@shared_task
-def cluster_hazards_dbscan(hazard_data: List[Dict[str, Any]], 
-                          eps: float = 0.1, 
-                          min_samples: int = 3):
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_dbscan(lat_rad, lon_rad, eps_km: float, min_samples: int) -> np.ndarray:
+    """DBSCAN labels (-1 for noise) for coordinates in radians"""
+    # sklearn takes ~1s to import; load it on first use, not at worker boot
+    from sklearn.cluster import DBSCAN
+
+    return DBSCAN(
+        eps=eps_km / EARTH_RADIUS_KM, min_samples=min_samples, metric="haversine", algorithm="ball_tree"
+    ).fit_predict(np.column_stack((lat_rad, lon_rad)))
+
+def cluster_points(latitudes, longitudes, severities=None, hazard_types=None,
+                   eps_km: float = 1.0, min_samples: int = 3) -> Dict[str, Any]:
     """
-    Cluster hazard reports using DBSCAN algorithm
-    
+    DBSCAN over great-circle distance. Points are clustered with the
+    haversine metric on a BallTree, so eps_km is a real distance. Cluster
+    statistics come from bincounts over the label array, not per-cluster
+    scans of the input.
+
     Args:
-        hazard_data: List of hazard reports with latitude/longitude
-        eps: Maximum distance between two samples for one to be considered
-             as in the neighborhood of the other
-        min_samples: Number of samples in a neighborhood for a point to be
-                     considered as a core point
-    
+        latitudes, longitudes: coordinates in degrees (array-likes of equal length)
+        severities: optional per-point severity; None entries are ignored
+        hazard_types: optional per-point hazard type strings
+        eps_km: neighbourhood radius in kilometres
+        min_samples: points within eps_km needed for a core point
+
     Returns:
-        Dictionary with cluster labels and statistics
+        Dictionary with clusters and statistics
     """
-    if not hazard_data:
-        return {"clusters": [], "statistics": {}}
-    
-    # Extract coordinates
-    coordinates = []
-    for hazard in hazard_data:
-        if 'latitude' in hazard and 'longitude' in hazard:
-            lat = hazard['latitude']
-            lon = hazard['longitude']
-            if lat is not None and lon is not None:
-                coordinates.append([lat, lon])
-    
-    if len(coordinates) < min_samples:
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon = lat[valid], lon[valid]
+    n = len(lat)
+    if n < min_samples:
         return {"clusters": [], "statistics": {"message": "Not enough data points"}}
-    
-    # Convert to numpy array and scale
-    X = np.array(coordinates)
-    X_scaled = StandardScaler().fit_transform(X)
-    
-    # Apply DBSCAN
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-    labels = dbscan.fit_predict(X_scaled)
-    
-    # Count clusters (excluding noise points labeled as -1)
-    unique_labels = set(labels)
-    n_clusters = len(unique_labels) - (1 if -1 in unique_labels else 0)
-    n_noise = list(labels).count(-1)
-    
-    # Prepare cluster information
-    clusters = []
-    for label in unique_labels:
-        if label == -1:
-            continue  # Skip noise points
-        
-        cluster_points = X[labels == label]
-        cluster_hazards = [hazard_data[i] for i in range(len(hazard_data)) 
-                          if labels[i] == label and i < len(hazard_data)]
-        
-        # Calculate cluster center
-        center = cluster_points.mean(axis=0).tolist()
-        
-        clusters.append({
-            "cluster_id": int(label),
-            "center": {"latitude": center[0], "longitude": center[1]},
-            "point_count": len(cluster_points),
-            "hazard_types": list(set(h['hazard_type'] for h in cluster_hazards if 'hazard_type' in h)),
-            "average_severity": np.mean([h.get('severity', 0) for h in cluster_hazards if 'severity' in h])
-        })
-    
+
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+    labels = haversine_dbscan(lat_rad, lon_rad, eps_km, min_samples)
+
+    clustered = labels >= 0
+    members = labels[clustered]
+    n_clusters = int(members.max()) + 1 if len(members) else 0
+    counts = np.bincount(members, minlength=n_clusters)
+
+    # Centres as the mean of unit vectors, which stays right across the antimeridian
+    cos_lat = np.cos(lat_rad)
+    xyz = [np.bincount(members, weights=w[clustered], minlength=n_clusters)
+           for w in (cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad))]
+    center_lat = np.degrees(np.arctan2(xyz[2], np.hypot(xyz[0], xyz[1])))
+    center_lon = np.degrees(np.arctan2(xyz[1], xyz[0]))
+
+    average_severity = np.full(n_clusters, np.nan)
+    if severities is not None:
+        severity = np.array(severities, dtype=np.float64)[valid][clustered]
+        rated = ~np.isnan(severity)
+        rated_counts = np.bincount(members[rated], minlength=n_clusters)
+        severity_sums = np.bincount(members[rated], weights=severity[rated], minlength=n_clusters)
+        np.divide(severity_sums, rated_counts, out=average_severity, where=rated_counts > 0)
+
+    types_per_cluster = [[] for _ in range(n_clusters)]
+    if hazard_types is not None:
+        names, codes = np.unique(np.asarray(hazard_types, dtype=object)[valid][clustered].astype(str), return_inverse=True)
+        # One unique() over (cluster, type) pairs instead of a set per cluster
+        pairs = np.unique(members.astype(np.int64) * len(names) + codes)
+        names = names.tolist()
+        for cluster_id, code in zip((pairs // len(names)).tolist(), (pairs % len(names)).tolist()):
+            if names[code]:
+                types_per_cluster[cluster_id].append(names[code])
+
+    clusters = [
+        {
+            "cluster_id": cluster_id,
+            "center": {"latitude": float(center_lat[cluster_id]), "longitude": float(center_lon[cluster_id])},
+            "point_count": int(counts[cluster_id]),
+            "hazard_types": types_per_cluster[cluster_id],
+            "average_severity": None if np.isnan(average_severity[cluster_id]) else float(average_severity[cluster_id]),
+        }
+        for cluster_id in range(n_clusters)
+    ]
     return {
         "clusters": clusters,
         "statistics": {
             "n_clusters": n_clusters,
-            "n_noise": n_noise,
-            "total_points": len(coordinates),
+            "n_noise": int(n - len(members)),
+            "total_points": n,
             "algorithm": "DBSCAN",
-            "parameters": {"eps": eps, "min_samples": min_samples}
+            "parameters": {"eps_km": eps_km, "min_samples": min_samples, "metric": "haversine"}
         }
     }
 
 @shared_task
-def generate_dbscan_hotspots(time_window_hours: int = 24):
+def cluster_hazards_dbscan(hazard_data: List[Dict[str, Any]],
+                          eps_km: float = 1.0,
+                          min_samples: int = 3):
     """
-    Generate hotspots using DBSCAN clustering on recent hazard reports
+    Cluster hazard reports given as dicts with latitude/longitude (and
+    optionally hazard_type, severity); see cluster_points
+    """
+    if not hazard_data:
+        return {"clusters": [], "statistics": {}}
+    nan = float("nan")
+    return cluster_points(
+        [h.get("latitude") if h.get("latitude") is not None else nan for h in hazard_data],
+        [h.get("longitude") if h.get("longitude") is not None else nan for h in hazard_data],
+        [h.get("severity") if h.get("severity") is not None else nan for h in hazard_data],
+        [h.get("hazard_type") or "" for h in hazard_data],
+        eps_km=eps_km,
+        min_samples=min_samples,
+    )
+
+BACKENDS = ("sklearn", "postgis", "kmeans")
+# Metres per degree of latitude on the sphere used for haversine
+METRES_PER_DEGREE = EARTH_RADIUS_KM * 1000 * np.pi / 180
+
+def sklearn_hotspots(db, since, eps_km: float = 1.0, min_samples: int = 3) -> Dict[str, Any]:
+    """Load the window's points in one query and cluster them in this process with cluster_points"""
+    from models import HazardReport
+    from sqlalchemy import select
+    import crud
+
+    # One query straight into column arrays; coordinates are the stored lon/lat floats
+    rows = db.execute(
+        select(HazardReport.latitude, HazardReport.longitude, HazardReport.severity, HazardReport.hazard_type)
+        .where(*crud.hazard_report_filters(since=since))
+    ).all()
+    if not rows:
+        return {"clusters": [], "statistics": {}}
+    latitudes, longitudes, severities, hazard_types = zip(*rows)
+    return cluster_points(
+        latitudes,
+        longitudes,
+        np.array(severities, dtype=np.float64),  # NULL severities become nan
+        hazard_types,
+        eps_km=eps_km,
+        min_samples=min_samples,
+    )
+
+def postgis_hotspots(db, since, eps_km: float = 1.0, min_samples: int = 3,
+                     algorithm: str = "dbscan", n_clusters: int = 8) -> Dict[str, Any]:
+    """
+    Cluster inside PostGIS with ST_ClusterDBSCAN (or ST_ClusterKMeans) as a
+    window function and fetch one aggregate row per cluster, so no points
+    leave the database.
+
+    Points are clustered in an equirectangular projection in metres scaled
+    at the window's mean latitude. Over a window a few hundred kilometres
+    tall this is within a few percent of the haversine distance the sklearn
+    backend uses; use that backend where exact geodesic eps matters.
     """
-    from sqlalchemy.orm import Session
-    from database import SessionLocal
     from models import HazardReport
-    from datetime import datetime, timedelta
-    
+    from sqlalchemy import select, func, distinct
+    import crud
+
+    hr = HazardReport
+    window = select(hr.geom, hr.latitude, hr.longitude, hr.severity, hr.hazard_type) \
+        .where(*crud.hazard_report_filters(since=since)).cte("window")
+    lon_scale = select(func.cos(func.radians(func.avg(window.c.latitude)))).scalar_subquery()
+    projected = func.ST_Scale(window.c.geom, lon_scale * METRES_PER_DEGREE, METRES_PER_DEGREE)
+    if algorithm == "kmeans":
+        cluster_id = func.ST_ClusterKMeans(projected, n_clusters).over()
+    else:
+        cluster_id = func.ST_ClusterDBSCAN(projected, eps_km * 1000, min_samples).over()
+    labelled = select(
+        window.c.latitude, window.c.longitude, window.c.severity, window.c.hazard_type, cluster_id.label("cluster_id")
+    ).subquery()
+
+    lat, lon = func.radians(labelled.c.latitude), func.radians(labelled.c.longitude)
+    # Centre as the mean unit vector, as in cluster_points
+    x = func.sum(func.cos(lat) * func.cos(lon))
+    y = func.sum(func.cos(lat) * func.sin(lon))
+    z = func.sum(func.sin(lat))
+    rows = db.execute(
+        select(
+            labelled.c.cluster_id,
+            func.count(),
+            func.degrees(func.atan2(z, func.sqrt(x * x + y * y))),
+            func.degrees(func.atan2(y, x)),
+            func.avg(labelled.c.severity),
+            func.array_agg(distinct(labelled.c.hazard_type)),
+        )
+        .group_by(labelled.c.cluster_id)
+        .order_by(labelled.c.cluster_id)
+    ).all()
+
+    total = sum(row[1] for row in rows)
+    if not rows:
+        return {"clusters": [], "statistics": {}}
+    if total < min_samples and algorithm != "kmeans":
+        return {"clusters": [], "statistics": {"message": "Not enough data points"}}
+    clusters = [
+        {
+            "cluster_id": cluster,
+            "center": {"latitude": center_lat, "longitude": center_lon},
+            "point_count": count,
+            "hazard_types": hazard_types,
+            "average_severity": float(severity) if severity is not None else None,
+        }
+        for cluster, count, center_lat, center_lon, severity, hazard_types in rows
+        if cluster is not None
+    ]
+    if algorithm == "kmeans":
+        parameters = {"n_clusters": n_clusters}
+    else:
+        parameters = {"eps_km": eps_km, "min_samples": min_samples, "metric": "equirectangular"}
+    return {
+        "clusters": clusters,
+        "statistics": {
+            "n_clusters": len(clusters),
+            "n_noise": total - sum(c["point_count"] for c in clusters),
+            "total_points": total,
+            "algorithm": "ST_ClusterKMeans" if algorithm == "kmeans" else "ST_ClusterDBSCAN",
+            "parameters": parameters,
+        }
+    }
+
+@shared_task
+def generate_dbscan_hotspots(time_window_hours: int = 24, eps_km: float = 1.0, min_samples: int = 3,
+                             backend: str = "sklearn", n_clusters: int = 8):
+    """
+    Generate hotspots using DBSCAN clustering on recent hazard reports.
+    backend is sklearn (points clustered in the worker), postgis
+    (ST_ClusterDBSCAN in the database) or kmeans (ST_ClusterKMeans with
+    n_clusters, for comparison); see bench_dbscan_backends.py.
+    """
+    from database import SessionLocal
+    from datetime import datetime, timedelta, timezone
+
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+    since = datetime.now(timezone.utc) - timedelta(hours=time_window_hours)
     db = SessionLocal()
     try:
-        # Get recent hazard reports
-        time_threshold = datetime.utcnow() - timedelta(hours=time_window_hours)
-        recent_reports = db.query(HazardReport).filter(
-            HazardReport.report_time >= time_threshold
-        ).all()
-        
-        # Prepare data for clustering
-        hazard_data = []
-        for report in recent_reports:
-            # Extract coordinates from geometry if needed
-            # For now, assuming latitude/longitude are stored separately
-            hazard_data.append({
-                "id": str(report.id),
-                "hazard_type": report.hazard_type,
-                "severity": report.severity,
-                "latitude": getattr(report, 'latitude', None),  # Adjust based on your schema
-                "longitude": getattr(report, 'longitude', None)
-            })
-        
-        # Apply DBSCAN clustering
-        result = cluster_hazards_dbscan.delay(hazard_data)
-        return result.get()
-        
+        if backend == "sklearn":
+            return sklearn_hotspots(db, since, eps_km, min_samples)
+        return postgis_hotspots(db, since, eps_km, min_samples,
+                                algorithm="kmeans" if backend == "kmeans" else "dbscan", n_clusters=n_clusters)
     finally:
         db.close()
@@ -1,33 +1,38 @@
 # tasks/nlp.py
 from celery import shared_task
-import nltk
-from textblob import TextBlob
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk import pos_tag
+from functools import lru_cache
 import string
 from datetime import datetime
 import re
 
-# Download required NLTK data (would need to be done once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# NLTK corpora are downloaded at image build time (see dockerfile); this
+# only fetches what is missing on a bare development machine
+NLTK_DATA = {
+    "punkt": "tokenizers/punkt",
+    "stopwords": "corpora/stopwords",
+    "vader_lexicon": "sentiment/vader_lexicon",
+}
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+def ensure_nltk_data():
+    import nltk
 
-try:
-    nltk.data.find('sentiment/vader_lexicon')
-except LookupError:
-    nltk.download('vader_lexicon')
+    for package, path in NLTK_DATA.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(package)
+
+@lru_cache(maxsize=None)
+def get_analyzer():
+    """One analyzer per worker process: nltk, textblob and the VADER lexicon load on first use"""
+    ensure_nltk_data()
+    return HazardNLPAnalyzer()
 
 class HazardNLPAnalyzer:
     def __init__(self):
+        from nltk.corpus import stopwords
+        from nltk.sentiment import SentimentIntensityAnalyzer
+
         self.sia = SentimentIntensityAnalyzer()
         self.stop_words = set(stopwords.words('english'))
         self.hazard_keywords = {
@@ -46,6 +51,10 @@ class HazardNLPAnalyzer:
         if not text or not isinstance(text, str):
             return {}
         
+        from nltk import pos_tag
+        from nltk.tokenize import word_tokenize
+        from textblob import TextBlob
+
         text = text.lower()
         
         # Sentiment analysis
@@ -123,7 +132,7 @@ class HazardNLPAnalyzer:
 @shared_task
 def analyze_hazard_text(text_data):
     """Analyze hazard-related text using NLP"""
-    analyzer = HazardNLPAnalyzer()
+    analyzer = get_analyzer()
     
     if isinstance(text_data, str):
         # Single text analysis
@@ -141,7 +150,7 @@ def analyze_hazard_text(text_data):
 @shared_task
 def process_social_media_batch(social_media_data):
     """Process a batch of social media posts with NLP"""
-    analyzer = HazardNLPAnalyzer()
+    analyzer = get_analyzer()
     processed_data = []
     
     for post in social_media_data:
@@ -162,7 +171,7 @@ def process_social_media_batch(social_media_data):
 @shared_task
 def detect_hazard_trends(text_corpus):
     """Detect trending hazard topics from a corpus of text"""
-    analyzer = HazardNLPAnalyzer()
+    analyzer = get_analyzer()
     
     if not text_corpus:
         return {}
@@ -170,6 +179,8 @@ def detect_hazard_trends(text_corpus):
     # Combine all text for analysis
     combined_text = " ".join([str(text) for text in text_corpus if text])
     
+    from nltk.tokenize import word_tokenize
+
     # Frequency analysis
     tokens = word_tokenize(combined_text.lower())
     filtered_tokens = [word for word in tokens if word not in analyzer.stop_words and word not in string.punctuation]
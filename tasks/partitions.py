@@ -0,0 +1,136 @@
+# tasks/partitions.py
+"""
+Partition upkeep for the range-partitioned hazard_reports table
+(migrations/0006_partition_hazard_reports.sql).
+
+Partitions are named hazard_reports_pYYYYMM (monthly) or
+hazard_reports_pYYYYMMDD (daily) and cover UTC periods. Beat runs
+maintain_hazard_partitions hourly: it creates the next few periods ahead of
+time and detaches partitions older than the retention window, either
+moving them to the hazard_archive schema or dropping them.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from celery import shared_task
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+from database import engine
+import models
+
+load_dotenv()
+
+PARTITION_INTERVAL = os.getenv("HAZARD_PARTITION_INTERVAL", "month")  # month | day
+PARTITIONS_AHEAD = int(os.getenv("HAZARD_PARTITIONS_AHEAD", "3"))
+# 0 keeps every partition
+RETENTION_DAYS = int(os.getenv("HAZARD_RETENTION_DAYS", "0"))
+RETENTION_ACTION = os.getenv("HAZARD_RETENTION_ACTION", "archive")  # archive | drop
+ARCHIVE_SCHEMA = "hazard_archive"
+
+PARENT = "hazard_reports"
+DEFAULT_PARTITION = "hazard_reports_default"
+PARTITION_NAME = re.compile(r"^hazard_reports_p(\d{6}|\d{8})$")
+# Serializes concurrent maintenance runs
+LOCK_KEY = 4171903
+
+def period_start(moment: datetime, interval: str = PARTITION_INTERVAL) -> datetime:
+    moment = moment.astimezone(timezone.utc)
+    if interval == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def period_end(start: datetime, interval: str = PARTITION_INTERVAL) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def partition_name(start: datetime, interval: str = PARTITION_INTERVAL) -> str:
+    return f"{PARENT}_p{start.strftime('%Y%m%d' if interval == 'day' else '%Y%m')}"
+
+def partition_bounds(name: str):
+    """(start, end) of a partition from its name, or None for names this module did not create"""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 8:
+        start = datetime.strptime(digits, "%Y%m%d").replace(tzinfo=timezone.utc)
+        return start, period_end(start, "day")
+    start = datetime.strptime(digits, "%Y%m").replace(tzinfo=timezone.utc)
+    return start, period_end(start, "month")
+
+def existing_partitions(conn) -> dict:
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT}).scalars()
+    return {name: bounds for name in names if (bounds := partition_bounds(name))}
+
+def create_partition(conn, name: str, start: datetime, end: datetime):
+    """
+    Create and attach one partition. Rows that already fell into the
+    default partition for this period are moved over first, otherwise
+    the attach would be refused.
+    """
+    bounds = {"start": start, "end": end}
+    # Generated columns (longitude, latitude) are recomputed, not copied
+    columns = ", ".join(c.name for c in models.HazardReport.__table__.columns if c.computed is None)
+    conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)")
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE report_time >= :start AND report_time < :end RETURNING {columns}
+        )
+        INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+    """), bounds)
+    conn.exec_driver_sql(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+def ensure_partitions(conn, now: datetime, ahead: int = PARTITIONS_AHEAD) -> list[str]:
+    """Partitions for the current period and `ahead` more; periods an existing partition overlaps are skipped"""
+    existing = existing_partitions(conn).values()
+    created = []
+    start = period_start(now)
+    for _ in range(ahead + 1):
+        end = period_end(start)
+        if not any(start < other_end and other_start < end for other_start, other_end in existing):
+            name = partition_name(start)
+            create_partition(conn, name, start, end)
+            created.append(name)
+        start = end
+    return created
+
+def apply_retention(conn, now: datetime, retention_days: int = RETENTION_DAYS,
+                    action: str = RETENTION_ACTION) -> list[str]:
+    """Detach partitions that end before the retention cutoff, then archive or drop them"""
+    if retention_days <= 0:
+        return []
+    cutoff = now - timedelta(days=retention_days)
+    retired = []
+    for name, (_, end) in sorted(existing_partitions(conn).items()):
+        if end > cutoff:
+            continue
+        conn.exec_driver_sql(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+        if action == "drop":
+            conn.exec_driver_sql(f"DROP TABLE {name}")
+        else:
+            conn.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+            conn.exec_driver_sql(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+        retired.append(name)
+    return retired
+
+@shared_task
+def maintain_hazard_partitions():
+    """Create upcoming hazard_reports partitions and retire expired ones"""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+        created = ensure_partitions(conn, now)
+        retired = apply_retention(conn, now)
+    return {"created": created, "retired": retired, "retention_action": RETENTION_ACTION if retired else None}
+
+if __name__ == "__main__":
+    print(maintain_hazard_partitions())
@@ -1,8 +1,6 @@
 # tasks/social_media.py
 from celery import shared_task
-import tweepy
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import json
 import os
@@ -25,6 +23,8 @@ def scrape_twitter_for_hazards(keywords=None, location=None, max_results=100):
         ]
     
     try:
+        import tweepy
+
         client = tweepy.Client(bearer_token=TWITTER_BEARER_TOKEN)
         
         # Build query
@@ -71,6 +71,8 @@ def scrape_twitter_for_hazards(keywords=None, location=None, max_results=100):
 @shared_task
 def scrape_news_sites():
     """Scrape news websites for hazard reports"""
+    from bs4 import BeautifulSoup
+
     news_sources = [
         "https://incois.gov.in",
         "https://mausam.imd.gov.in",
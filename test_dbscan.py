@@ -63,5 +63,82 @@ def test_dbscan_basic():
             for idx in cluster_indices:
                 print(f"  - {hazard_data[idx]}")
 
+def test_dbscan_haversine():
+    """Test the geodesic DBSCAN pipeline used by the hotspot task"""
+    from tasks.ml_clustering import cluster_hazards_dbscan
+
+    print("Testing haversine DBSCAN clustering...")
+    hazard_data = [
+        {"latitude": 18.5204, "longitude": 73.8567, "hazard_type": "Tsunami", "severity": 8},
+        {"latitude": 18.5205, "longitude": 73.8568, "hazard_type": "Tsunami", "severity": 7},
+        {"latitude": 18.5206, "longitude": 73.8569, "hazard_type": "Storm", "severity": None},
+        {"latitude": 19.0760, "longitude": 72.8777, "hazard_type": "Flood", "severity": 6},
+        {"latitude": 19.0761, "longitude": 72.8778, "hazard_type": "Flood", "severity": 4},
+        {"latitude": 13.0827, "longitude": 80.2707, "hazard_type": "Earthquake", "severity": 9},
+        # 1.5 km apart across the antimeridian
+        {"latitude": -16.5, "longitude": 179.993, "hazard_type": "Storm", "severity": 3},
+        {"latitude": -16.5, "longitude": -179.993, "hazard_type": "Storm", "severity": 5},
+    ]
+
+    result = cluster_hazards_dbscan(hazard_data, eps_km=2.0, min_samples=2)
+    for cluster in result["clusters"]:
+        print(f"Cluster {cluster['cluster_id']}: {cluster}")
+    print(f"Statistics: {result['statistics']}")
+
+    pune, mumbai, pacific = result["clusters"]
+    assert result["statistics"]["n_noise"] == 1
+    assert pune["point_count"] == 3 and pune["hazard_types"] == ["Storm", "Tsunami"]
+    assert pune["average_severity"] == 7.5
+    assert mumbai["point_count"] == 2 and mumbai["hazard_types"] == ["Flood"]
+    assert pacific["point_count"] == 2 and abs(abs(pacific["center"]["longitude"]) - 180) < 0.01
+
+    # Mumbai and Pune are ~120 km apart: one cluster at 150 km, none at 2 km
+    assert cluster_hazards_dbscan(hazard_data[:5], eps_km=150, min_samples=5)["statistics"]["n_clusters"] == 1
+    assert cluster_hazards_dbscan(hazard_data[:5], eps_km=2, min_samples=5)["statistics"]["n_clusters"] == 0
+    print("Haversine DBSCAN test passed")
+
+def test_incremental_links():
+    """Test how the incremental hotspot refresh links points that became core"""
+    from tasks.incremental_hotspots import plan_links
+
+    print("Testing incremental cluster linking...")
+    # (core point, neighbour, neighbour's neighbour count, neighbour's cluster), min_samples = 3
+    pairs = [
+        # "a" joins cluster 7 and cluster 4 through two core neighbours, and picks up noise "n"
+        ("a", "a", 3, None), ("a", "b", 5, 7), ("a", "c", 4, 4), ("a", "n", 1, None),
+        # "x" and "y" are new and reach each other but no cluster: one new cluster
+        ("x", "x", 3, None), ("x", "y", 3, None), ("y", "y", 3, None), ("y", "x", 3, None),
+        # border "m" already in cluster 9 stays there
+        ("y", "m", 2, 9),
+    ]
+    components = sorted(plan_links(pairs, min_samples=3), key=lambda c: c[0])
+    print(f"Components: {components}")
+
+    assert components == [([], {"x", "y"}), ([4, 7], {"a", "n"})]
+    print("Incremental linking test passed")
+
+def test_incremental_borders():
+    """Test how the incremental hotspot refresh attaches new points that are not core"""
+    from tasks.incremental_hotspots import plan_borders
+
+    print("Testing incremental border attachment...")
+    # (new point, neighbour, neighbour's neighbour count, neighbour's cluster), min_samples = 3
+    pairs = [
+        # "b" reaches core points of clusters 5 and 2: it joins the lower id
+        ("b", "b", 2, None), ("b", "c", 4, 5), ("b", "d", 3, 2),
+        # "e" only reaches a border point of cluster 5 and an unclustered core point: stays noise
+        ("e", "e", 1, None), ("e", "f", 2, 5), ("e", "g", 3, None),
+        # "h" was already linked when a neighbour became core
+        ("h", "h", 2, 8), ("h", "c", 4, 5),
+    ]
+    borders = plan_borders(pairs, min_samples=3)
+    print(f"Borders: {borders}")
+
+    assert borders == {"b": 2}
+    print("Incremental border test passed")
+
 if __name__ == "__main__":
     test_dbscan_basic()
+    test_dbscan_haversine()
+    test_incremental_links()
+    test_incremental_borders()
@@ -0,0 +1,58 @@
+# test_dedup.py
+from datetime import datetime, timedelta, timezone
+
+from crud import group_batch_duplicates
+from schemas import HazardReportCreate
+
+# About 100 m of latitude
+DEG_100M = 100 / 111195
+
+def report(lat, lon, hazard_type="Flood", severity=3):
+    return HazardReportCreate(hazard_type=hazard_type, latitude=lat, longitude=lon, severity=severity)
+
+def test_batch_groups():
+    """Test that reports fold into the closest earlier report of their type within the radius"""
+    print("Testing in-batch duplicate groups...")
+    batch = [
+        report(19.0, 72.8),
+        report(19.0 + 0.5 * DEG_100M, 72.8),                     # 50 m north: folds into 0
+        report(19.0 + 0.5 * DEG_100M, 72.8, hazard_type="Tsunami"),  # other type: stays
+        report(19.0 + 1.5 * DEG_100M, 72.8),                     # 150 m from 0: stays
+        report(19.0 + 1.1 * DEG_100M, 72.8),                     # 110 m from 0, 40 m from 3: folds into 3
+        report(-12.0, 45.0),
+    ]
+    assert group_batch_duplicates(batch, radius_m=100) == [0, 0, 2, 3, 3, 5]
+    print("Batch groups test passed")
+
+def test_batch_groups_do_not_chain():
+    """Test that a report only folds into a group's first report, not into a folded one"""
+    print("Testing that groups do not chain...")
+    batch = [report(0.0, 10.0), report(0.8 * DEG_100M, 10.0), report(1.6 * DEG_100M, 10.0)]
+    assert group_batch_duplicates(batch, radius_m=100) == [0, 0, 2]
+    print("No chaining test passed")
+
+def test_batch_groups_window():
+    """Test that reports further apart in time than the window stay separate"""
+    print("Testing the in-batch time window...")
+    now = datetime(2026, 10, 17, 13, 25, tzinfo=timezone.utc)
+    batch = [report(5.0, 80.0), report(5.0, 80.0), report(5.0, 80.0)]
+    times = [now, now + timedelta(minutes=45), now + timedelta(minutes=20)]
+    assert group_batch_duplicates(batch, times, radius_m=100, window_minutes=30) == [0, 1, 0]
+    # Without report_times the whole batch is simultaneous
+    assert group_batch_duplicates(batch, radius_m=100, window_minutes=30) == [0, 0, 0]
+    print("Time window test passed")
+
+def test_batch_groups_across_antimeridian():
+    """Test that neighbours on opposite sides of the antimeridian and near a pole are found"""
+    print("Testing groups across the antimeridian...")
+    batch = [report(0.0, 179.9997), report(0.0, -179.9997)]      # about 67 m apart
+    assert group_batch_duplicates(batch, radius_m=100) == [0, 0]
+    batch = [report(89.9996, 0.0), report(89.9996, 180.0)]       # about 89 m apart over the pole
+    assert group_batch_duplicates(batch, radius_m=100) == [0, 0]
+    print("Antimeridian test passed")
+
+if __name__ == "__main__":
+    test_batch_groups()
+    test_batch_groups_do_not_chain()
+    test_batch_groups_window()
+    test_batch_groups_across_antimeridian()
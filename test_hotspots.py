@@ -0,0 +1,139 @@
+# test_hotspots.py
+import math
+import random
+
+from tasks.hotspots import grid_hotspots, cluster_reports
+
+def reference_hotspots(features, grid_size, min_reports):
+    """The per-report dict loop generate_hotspots used before, for comparison"""
+    cells = {}
+    for feature in features:
+        lon, lat = feature["geometry"]["coordinates"]
+        grid_x = math.floor(lon / grid_size) * grid_size
+        grid_y = math.floor(lat / grid_size) * grid_size
+        cell = cells.setdefault(f"{grid_x}_{grid_y}", {"count": 0, "total": 0, "types": set(), "ids": [], "x": grid_x, "y": grid_y})
+        cell["count"] += 1
+        cell["total"] += feature["properties"]["severity"]
+        cell["types"].add(feature["properties"]["hazard_type"])
+        cell["ids"].append(feature["properties"]["id"])
+    return {
+        f"hotspot_{key}": (c["count"], round(c["total"] / c["count"], 2), sorted(c["types"]), c["ids"], [c["x"] + grid_size / 2, c["y"] + grid_size / 2])
+        for key, c in cells.items() if c["count"] >= min_reports
+    }
+
+def test_grid_hotspots_basic():
+    """Test grid hotspots on a few hand-placed reports"""
+    print("Testing grid hotspots...")
+    hotspots = grid_hotspots(
+        ["a", "b", "c", "d", "e"],
+        [80.21, 80.22, 80.23, 72.87, 80.25],
+        [13.01, 13.02, 13.03, 19.07, 13.04],
+        [4, 2, None, 5, 3],
+        ["Flood", "Storm", "Flood", "Flood", "Erosion"],
+        grid_size=0.1,
+        min_reports=3,
+    )
+    print(f"Hotspots: {hotspots}")
+    assert len(hotspots) == 1
+    hotspot = hotspots[0]
+    assert hotspot["count"] == 4
+    assert hotspot["report_ids"] == ["a", "b", "c", "e"]
+    assert hotspot["hazard_types"] == ["Erosion", "Flood", "Storm"]
+    assert hotspot["average_severity"] == 2.25  # the missing severity counts as 0
+    assert hotspot["intensity"] == min(10.0, 4 * 0.7 + 2.25 * 0.3)
+    print("Grid hotspots test passed")
+
+def test_grid_hotspots_match_reference():
+    """Test the vectorised grid against the old dict loop on random reports"""
+    print("Testing grid hotspots against the reference loop...")
+    rng = random.Random(3)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0)]},
+            "properties": {"id": str(i), "hazard_type": rng.choice(["Flood", "Storm", "Tsunami"]), "severity": rng.randint(1, 5)},
+        }
+        for i in range(5000)
+    ]
+    for grid_size in (0.1, 0.25):
+        expected = reference_hotspots(features, grid_size, 3)
+        hotspots = cluster_reports(features, grid_size=grid_size, min_reports=3)
+        got = {h["id"]: (h["count"], h["average_severity"], h["hazard_types"], h["report_ids"], h["center"]) for h in hotspots}
+        assert got == expected, f"grid_size {grid_size}: {len(got)} cells vs {len(expected)}"
+        intensities = [h["intensity"] for h in hotspots]
+        assert intensities == sorted(intensities, reverse=True)
+    print("Reference comparison test passed")
+
+def test_hex_pyramid_rows():
+    """Test the hexagon pyramid rows and the bucket split of a query window"""
+    from datetime import datetime, timedelta, timezone
+    import crud
+    import hexgrid
+    from tasks.hex_pyramid import aggregate_rows, horizons
+
+    print("Testing hex pyramid aggregation...")
+    now = datetime(2026, 10, 17, 13, 25, tzinfo=timezone.utc)
+    rng = random.Random(5)
+    reports = [
+        (now - timedelta(minutes=rng.uniform(0, 3 * 24 * 60)), rng.choice(["Flood", "Storm"]),
+         rng.choice([None, 1, 2, 3, 4, 5]), rng.uniform(80.0, 80.5), rng.uniform(13.0, 13.5))
+        for _ in range(2000)
+    ]
+    rows = aggregate_rows(reports, horizons(now))
+    for resolution in hexgrid.RESOLUTIONS:
+        for width in ("hour", "day"):
+            cells = [row for row in rows if row["resolution"] == resolution and row["bucket_width"] == width]
+            # Every report lands in exactly one cell per resolution and bucket width
+            assert sum(row["report_count"] for row in cells) == len(reports)
+            assert sum(row["severity_count"] for row in cells) == sum(r[2] is not None for r in reports)
+            assert len({(row["bucket_start"], row["hazard_type"], row["q"], row["r"]) for row in cells}) == len(cells)
+
+    hour_start, day_start, day_end, hour_end = crud.hex_window(now - timedelta(days=2, hours=5), now)
+    assert (hour_start, hour_end) == (now.replace(minute=0) - timedelta(days=2, hours=5), now.replace(minute=0) + timedelta(hours=1))
+    assert (day_start, day_end) == (datetime(2026, 10, 16, tzinfo=timezone.utc), datetime(2026, 10, 17, tzinfo=timezone.utc))
+
+    print("Hex pyramid test passed")
+
+def test_hex_window():
+    """Test how a query window maps to day and hour buckets"""
+    from datetime import datetime, timedelta, timezone
+    import crud
+    from tasks.hex_pyramid import horizons
+
+    print("Testing hex window bucketing...")
+
+    def utc(day, hour=0):
+        return datetime(2026, 10, day, hour, tzinfo=timezone.utc)
+
+    now = datetime(2026, 10, 17, 13, 25, tzinfo=timezone.utc)
+    hour_horizon = horizons(now)["hour"]
+    assert hour_horizon == utc(10, 13)
+
+    # Inside one day: hours only, day range empty
+    assert crud.hex_window(utc(17, 2) + timedelta(minutes=10), utc(17, 9) + timedelta(minutes=5)) == (
+        utc(17, 2), utc(17, 10), utc(17, 10), utc(17, 10))
+    # Aware times in another zone are cut in UTC: 10:00 IST on the 16th is 04:30 UTC
+    # and 03:30 IST on the 18th is 22:00 UTC on the 17th, so no whole UTC day is covered
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert crud.hex_window(datetime(2026, 10, 16, 10, 0, tzinfo=ist), datetime(2026, 10, 18, 3, 30, tzinfo=ist)) == (
+        utc(16, 4), utc(17, 22), utc(17, 22), utc(17, 22))
+    assert crud.hex_window(datetime(2026, 10, 15, 10, 0, tzinfo=ist), datetime(2026, 10, 18, 3, 30, tzinfo=ist)) == (
+        utc(15, 4), utc(16), utc(17), utc(17, 22))
+    # until exactly at midnight: no trailing hours, with or without a horizon
+    assert crud.hex_window(utc(15, 6), utc(17)) == (utc(15, 6), utc(16), utc(17), utc(17))
+    assert crud.hex_window(utc(15, 6), utc(17), hour_horizon) == (utc(15, 6), utc(16), utc(17), utc(17))
+    # A start edge before the horizon widens to the whole day; recent end hours stay hourly
+    assert crud.hex_window(utc(8, 8), utc(11, 12), hour_horizon) == (utc(8), utc(8), utc(11), utc(11, 12))
+    # An end edge straddling the horizon widens to the next midnight
+    assert crud.hex_window(utc(8, 8), utc(10, 15), hour_horizon) == (utc(8), utc(8), utc(11), utc(11))
+    # A window entirely before the horizon, inside one day, is served as that day
+    assert crud.hex_window(utc(9, 3), utc(9, 5), hour_horizon) == (utc(9), utc(9), utc(10), utc(10))
+    # Edges after the horizon are unchanged by it
+    assert crud.hex_window(utc(12, 7), utc(14, 9), hour_horizon) == crud.hex_window(utc(12, 7), utc(14, 9))
+    print("Hex window test passed")
+
+if __name__ == "__main__":
+    test_grid_hotspots_basic()
+    test_grid_hotspots_match_reference()
+    test_hex_pyramid_rows()
+    test_hex_window()
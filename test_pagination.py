@@ -0,0 +1,37 @@
+# test_pagination.py
+import base64
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from crud import decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    """Test that next_cursor decodes back to the (report_time, id) it was made from"""
+    print("Testing cursor round trip...")
+    report_id = uuid.UUID("7b0c4f7e-2f6a-4d8e-9c1b-5a3e2d1f0c9b")
+    for report_time in (
+        datetime(2026, 10, 17, 13, 25, 7, 123456, tzinfo=timezone.utc),
+        datetime(2026, 1, 1, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    ):
+        cursor = encode_cursor(report_time, report_id)
+        # Query-string safe: no padding, no + or /
+        assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+        assert decode_cursor(cursor) == (report_time, report_id)
+    print("Cursor round trip test passed")
+
+def test_malformed_cursor():
+    """Test that anything encode_cursor did not produce raises ValueError (a 400 in main.py)"""
+    print("Testing malformed cursors...")
+    good = encode_cursor(datetime(2026, 10, 17, tzinfo=timezone.utc), uuid.UUID(int=42))
+    wrong_fields = base64.urlsafe_b64encode(b"yesterday|42").decode()
+    for cursor in ["", "not a cursor", "%%%", good[:-4], wrong_fields, good + "Zm9v"]:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            continue
+        raise AssertionError(f"{cursor!r} decoded")
+    print("Malformed cursor test passed")
+
+if __name__ == "__main__":
+    test_cursor_round_trip()
+    test_malformed_cursor()
@@ -0,0 +1,28 @@
+# test_tiles.py
+from tiles import changed_tiles, point_to_tile, versioned_tile
+
+def test_changed_tiles():
+    """Test that a write touches exactly one tile per versioned zoom, the one containing it"""
+    print("Testing changed tiles...")
+    changed = changed_tiles([(72.8777, 19.076)], max_zoom=16)
+    assert len(changed) == 17
+    assert (0, 0, 0) in changed and (1, 1, 0) in changed
+    assert (16, *point_to_tile(72.8777, 19.076, 16)) in changed
+    # Points sharing the deep tiles collapse; a far one adds its own
+    assert changed_tiles([(72.8777, 19.076), (72.8777, 19.076)], max_zoom=16) == changed
+    assert len(changed_tiles([(72.8777, 19.076), (-43.2, -22.9)], max_zoom=16)) == 17 + 16
+    print("Changed tiles test passed")
+
+def test_versioned_tile():
+    """Test that tiles past the versioned zoom are covered by their ancestor, which a write inside them bumps"""
+    print("Testing versioned tiles...")
+    assert versioned_tile(12, 2915, 1797, max_zoom=16) == (12, 2915, 1797)
+    for lon, lat in [(72.8777, 19.076), (-179.99, -85.0), (179.99, 85.0)]:
+        deep = versioned_tile(20, *point_to_tile(lon, lat, 20), max_zoom=16)
+        assert deep == (16, *point_to_tile(lon, lat, 16))
+        assert deep in changed_tiles([(lon, lat)], max_zoom=16)
+    print("Versioned tile test passed")
+
+if __name__ == "__main__":
+    test_changed_tiles()
+    test_versioned_tile()
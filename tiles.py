@@ -0,0 +1,69 @@
+# tiles.py
+import math
+import os
+import threading
+from collections import OrderedDict
+
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "4096"))
+# Deepest zoom with its own tile versions (hazard_tile_versions); writers and
+# API workers must agree on it
+TILE_CACHE_MAX_ZOOM = int(os.getenv("TILE_CACHE_MAX_ZOOM", "16"))
+MAX_ZOOM = 22
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+def point_to_tile(lon: float, lat: float, z: int):
+    """XYZ (web mercator) tile containing a WGS84 point"""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def changed_tiles(points, max_zoom=TILE_CACHE_MAX_ZOOM):
+    """(z, x, y) of every versioned tile containing one of these (lon, lat) points"""
+    return {(z, *point_to_tile(lon, lat, z)) for lon, lat in points for z in range(max_zoom + 1)}
+
+def versioned_tile(z: int, x: int, y: int, max_zoom=TILE_CACHE_MAX_ZOOM):
+    """The tile whose version covers (z, x, y): itself, or its ancestor at max_zoom"""
+    shift = max(z - max_zoom, 0)
+    return z - shift, x >> shift, y >> shift
+
+class TileCache:
+    """
+    In-process LRU of encoded tiles keyed on (tile version, z, x, y, filters).
+    The tile version is the hazard_change_seq value of the last write inside
+    the tile (hazard_tile_versions), so a write from any process retires the
+    cached copies of the tiles containing it and no others; retired entries
+    are never read again and fall out through the LRU.
+    """
+
+    def __init__(self, maxsize=TILE_CACHE_SIZE, max_zoom=TILE_CACHE_MAX_ZOOM):
+        self.maxsize = maxsize
+        self.max_zoom = max_zoom
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            tile = self._entries.get(key)
+            if tile is not None:
+                self._entries.move_to_end(key)
+            return tile
+
+    def set(self, key, tile: bytes):
+        z = key[1]
+        if z > self.max_zoom or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = tile
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+tile_cache = TileCache()
@@ -0,0 +1,77 @@
+# uploads.py
+"""
+Streaming storage for media attached to hazard reports.
+
+The request body is written to disk as it arrives, in MEDIA_CHUNK_BYTES
+writes, so an upload holds at most one chunk in memory. At most
+MEDIA_MAX_CONCURRENT_UPLOADS run per API worker; beyond that the API
+answers 503 instead of queueing more buffers.
+"""
+import asyncio
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+MEDIA_CHUNK_BYTES = int(os.getenv("MEDIA_CHUNK_BYTES", str(1024 * 1024)))
+MEDIA_MAX_CONCURRENT_UPLOADS = int(os.getenv("MEDIA_MAX_CONCURRENT_UPLOADS", "32"))
+MAX_BYTES = {
+    "image": int(os.getenv("MEDIA_MAX_IMAGE_BYTES", str(10 * 1024 * 1024))),
+    "audio": int(os.getenv("MEDIA_MAX_AUDIO_BYTES", str(25 * 1024 * 1024))),
+    "video": int(os.getenv("MEDIA_MAX_VIDEO_BYTES", str(200 * 1024 * 1024))),
+}
+
+upload_slots = asyncio.Semaphore(MEDIA_MAX_CONCURRENT_UPLOADS)
+
+class UploadTooLarge(Exception):
+    pass
+
+def media_kind(content_type: str | None) -> str | None:
+    """image, video or audio for an accepted Content-Type, otherwise None"""
+    kind = (content_type or "").split("/", 1)[0].strip().lower()
+    return kind if kind in MAX_BYTES else None
+
+def media_path(content_type: str, media_id: uuid.UUID) -> Path:
+    """Final location: uploads/<yyyy>/<mm>/<media id><ext>"""
+    now = datetime.now(timezone.utc)
+    ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+    return UPLOAD_DIR / f"{now:%Y}" / f"{now:%m}" / f"{media_id}{ext}"
+
+async def save_stream(chunks, dest: Path, max_bytes: int) -> int:
+    """
+    Write an async iterator of byte chunks to dest in MEDIA_CHUNK_BYTES
+    writes and return the size. The file appears under dest only once it is
+    complete; an oversized or interrupted upload leaves nothing behind.
+    """
+    partial = dest.with_name(dest.name + ".part")
+    await aiofiles.os.makedirs(dest.parent, exist_ok=True)
+    size = 0
+    buffer = bytearray()
+    try:
+        async with aiofiles.open(partial, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                buffer += chunk
+                if len(buffer) >= MEDIA_CHUNK_BYTES:
+                    await f.write(buffer)
+                    buffer.clear()
+            if buffer:
+                await f.write(buffer)
+        await aiofiles.os.replace(partial, dest)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(partial)
+        except FileNotFoundError:
+            pass
+        raise
+    return size